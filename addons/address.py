@@ -307,19 +307,48 @@ class address(moduleBase):
             return
         self._inet_address_list_config(ifaceobj, newaddrs, newaddr_attrs)
 
+    def _get_vrf_table_id(self, vrf):
+        try:
+            table = self.ipcmd.link_get_linkinfo_attrs(vrf).get('table')
+            return int(table) if table else None
+        except Exception:
+            return None
+
     def _add_delete_gateway(self, ifaceobj, gateways=[], prev_gw=[]):
         vrf = ifaceobj.get_attr_value_first('vrf')
         metric = ifaceobj.get_attr_value_first('metric')
-        for del_gw in list(set(prev_gw) - set(gateways)):
-            try:
-                self.ipcmd.route_del_gateway(ifaceobj.name, del_gw, vrf, metric)
-            except Exception as e:
-                self.logger.debug('%s: %s' % (ifaceobj.name, str(e)))
-        for add_gw in gateways:
-            try:
-                self.ipcmd.route_add_gateway(ifaceobj.name, add_gw, vrf)
-            except Exception as e:
-                self.log_error('%s: %s' % (ifaceobj.name, str(e)))
+        del_gws = list(set(prev_gw) - set(gateways))
+        table = self._get_vrf_table_id(vrf) if vrf else None
+        if vrf and not table:
+            # vrf table id unknown (vrf device not created yet or dry run),
+            # let iproute2 resolve the vrf name
+            for del_gw in del_gws:
+                try:
+                    self.ipcmd.route_del_gateway(ifaceobj.name, del_gw, vrf, metric)
+                except Exception as e:
+                    self.logger.debug('%s: %s' % (ifaceobj.name, str(e)))
+            for add_gw in gateways:
+                try:
+                    self.ipcmd.route_add_gateway(ifaceobj.name, add_gw, vrf)
+                except Exception as e:
+                    self.log_error('%s: %s' % (ifaceobj.name, str(e)))
+            return
+        # all the gateways are sent over netlink at once, the kernel acks
+        # each route separately
+        if del_gws:
+            errors = netlink.route_del_gateways(ifaceobj.name, del_gws,
+                                                table=table, metric=metric)
+            for del_gw in del_gws:
+                if del_gw in errors:
+                    self.logger.debug('%s: %s' % (ifaceobj.name,
+                                                  str(errors[del_gw])))
+        if gateways:
+            errors = netlink.route_add_gateways(ifaceobj.name, gateways,
+                                                table=table)
+            for add_gw in gateways:
+                if add_gw in errors:
+                    self.log_error('%s: %s' % (ifaceobj.name,
+                                               str(errors[add_gw])))
 
     def _get_prev_gateway(self, ifaceobj, gateways):
         ipv = []
@@ -227,9 +227,18 @@ class bond(moduleBase):
             return policy_default_val
         return attrval
 
+    # changing any of these requires the bond to be admin down
+    _bond_attrs_require_link_down = ['mode', 'xmit_hash_policy',
+                                     'lacp_rate', 'min_links']
+
+    # these are only valid in 802.3ad mode, the kernel rejects the
+    # whole RTM_NEWLINK if they are present in any other mode
+    _bond_attrs_8023ad_only = ['lacp_rate', 'lacp_bypass',
+                               'ad_actor_system', 'ad_actor_sys_prio']
+
     def _apply_master_settings(self, ifaceobj):
-        have_attrs_to_set = 0
-        linkup = False
+        """ creates the bond, or updates it, with all its attributes
+        in a single netlink message """
         bondcmd_attrmap =  OrderedDict([('bond-mode' , 'mode'),
                                  ('bond-miimon' , 'miimon'),
                                  ('bond-use-carrier', 'use_carrier'),
@@ -245,29 +254,53 @@ class bond(moduleBase):
                                  ('bond-lacp-bypass-allow', 'lacp_bypass'),
                                  ('bond-updelay', 'updelay'),
                                  ('bond-downdelay', 'downdelay')])
-        linkup = self.ipcmd.is_link_up(ifaceobj.name)
-        try:
-            # order of attributes set matters for bond, so
-            # construct the list sequentially
-            attrstoset = OrderedDict()
-            for k, dstk in bondcmd_attrmap.items():
-                v = self.fetch_attr(ifaceobj, k)
-                if v:
-                    attrstoset[dstk] = v
+        link_exists = self.ipcmd.link_exists(ifaceobj.name)
+        linkup = link_exists and self.ipcmd.is_link_up(ifaceobj.name)
+
+        # order of attributes set matters for bond, so
+        # construct the list sequentially
+        attrstoset = OrderedDict()
+        for k, dstk in bondcmd_attrmap.items():
+            v = self.fetch_attr(ifaceobj, k)
+            if v:
+                attrstoset[dstk] = v
+
+        # support yes/no attrs
+        utils.support_yesno_attrs(attrstoset, ['use_carrier', 'lacp_bypass'])
+
+        if 'mode' in attrstoset:
+            attrstoset['mode'] = bond._get_readable_bond_mode(attrstoset['mode'])
+            mode = attrstoset['mode']
+        elif link_exists:
+            mode = self.bondcmd.get_mode(ifaceobj.name)
+        else:
+            mode = self.get_mod_subattr('bond-mode', 'default')
+        if mode != '802.3ad':
+            for attrname in self._bond_attrs_8023ad_only:
+                if attrname in attrstoset:
+                    del attrstoset[attrname]
+
+        if link_exists:
+            attrstoset = self.bondcmd.get_changed_attrs(ifaceobj.name,
+                                                        attrstoset)
             if not attrstoset:
                 return
 
-            # support yes/no attrs
-            utils.support_yesno_attrs(attrstoset, ['use_carrier', 'lacp_bypass'])
-
-            have_attrs_to_set = 1
-            self.bondcmd.set_attrs(ifaceobj.name, attrstoset,
-                    self.ipcmd.link_down if linkup else None)
-        except:
-            raise
-        finally:
-            if have_attrs_to_set and linkup:
+        state = None
+        if linkup and [a for a in attrstoset
+                       if a in self._bond_attrs_require_link_down]:
+            netlink.link_set_updown(ifaceobj.name, 'down')
+            # the same message brings the bond back up once
+            # all the attributes are applied
+            state = 'up'
+        try:
+            netlink.link_add_bond(ifaceobj.name, attrstoset, state=state)
+        except Exception, e:
+            if state:
                 netlink.link_set_updown(ifaceobj.name, 'up')
+            if not link_exists or not ifupdownflags.flags.FORCE:
+                raise
+            self.logger.warn(str(e))
 
     def _add_slaves(self, ifaceobj):
         runningslaves = []
@@ -282,31 +315,29 @@ class bond(moduleBase):
 
         clag_bond = self._is_clag_bond(ifaceobj)
 
-        for slave in Set(slaves).difference(Set(runningslaves)):
+        slaves_to_add = []
+        for slave in slaves:
+            if runningslaves and slave in runningslaves:
+                continue
             if (not ifupdownflags.flags.PERFMODE and
                 not self.ipcmd.link_exists(slave)):
                     self.log_error('%s: skipping slave %s, does not exist'
                                    %(ifaceobj.name, slave), ifaceobj,
                                      raise_error=False)
                     continue
-            link_up = False
-            if self.ipcmd.is_link_up(slave):
-                netlink.link_set_updown(slave, "down")
-                link_up = True
-            # If clag bond place the slave in a protodown state; clagd
-            # will protoup it when it is ready
-            if clag_bond:
-                try:
-                    netlink.link_set_protodown(slave, "on")
-                except Exception, e:
-                    self.logger.error('%s: %s' % (ifaceobj.name, str(e)))
-            netlink.link_set_master(slave, ifaceobj.name)
-            if link_up or ifaceobj.link_type != ifaceLinkType.LINK_NA:
-               try:
-                    netlink.link_set_updown(slave, "up")
-               except Exception, e:
-                    self.logger.debug('%s: %s' % (ifaceobj.name, str(e)))
-                    pass
+            # slaves are brought down to be enslaved, bring them back
+            # up if they were up or if the bond owns their link state
+            if (self.ipcmd.is_link_up(slave) or
+                    ifaceobj.link_type != ifaceLinkType.LINK_NA):
+                slaves_to_add.append((slave, 'up'))
+            else:
+                slaves_to_add.append((slave, None))
+
+        if slaves_to_add:
+            # If clag bond place the slaves in a protodown state; clagd
+            # will protoup them when it is ready
+            netlink.link_set_master_many(ifaceobj.name, slaves_to_add,
+                                         protodown=True if clag_bond else None)
 
         if runningslaves:
             for s in runningslaves:
@@ -320,8 +351,6 @@ class bond(moduleBase):
 
     def _up(self, ifaceobj):
         try:
-            if not self.ipcmd.link_exists(ifaceobj.name):
-                self.bondcmd.create_bond(ifaceobj.name)
             self._apply_master_settings(ifaceobj)
             self._add_slaves(ifaceobj)
         except Exception, e:
@@ -35,6 +35,8 @@ class vlan(moduleBase):
         moduleBase.__init__(self, *args, **kargs)
         self.ipcmd = None
         self._bridge_vids_query_cache = {}
+        # vlans created in a batch ahead of their own 'pre-up'
+        self._vlans_created = set()
         self._resv_vlan_range =  self._get_reserved_vlan_range()
         self.logger.debug('%s: using reserved vlan range %s'
                   %(self.__class__.__name__, str(self._resv_vlan_range)))
@@ -126,20 +128,71 @@ class vlan(moduleBase):
             ifaceobjcurr.status = ifaceStatus.ERROR
             ifaceobjcurr.status_str = 'bridge vid error'
 
-    def _up(self, ifaceobj):
+    def _get_pending_sibling_vlans(self, ifaceobj, vlanrawdevice,
+                                   ifaceobj_getfunc):
+        """ Returns the (vlanrawdevice, ifacename, vlanid) list of the
+        other configured vlans on vlanrawdevice that will be brought up
+        by this run and dont exist yet """
+        siblings = []
+        rawdevobjs = ifaceobj_getfunc(vlanrawdevice)
+        if not rawdevobjs:
+            return siblings
+        for u in rawdevobjs[0].upperifaces or []:
+            if u == ifaceobj.name or u in self._vlans_created:
+                continue
+            uobjs = ifaceobj_getfunc(u)
+            if not uobjs:
+                continue
+            uobj = uobjs[0]
+            if (uobj.blacklisted or uobj.type == ifaceType.BRIDGE_VLAN or
+                    not self._is_vlan_device(uobj) or
+                    self._get_vlan_raw_device(uobj) != vlanrawdevice):
+                continue
+            vlanid = self._get_vlan_id(uobj)
+            if vlanid == -1:
+                continue
+            if (not ifupdownflags.flags.PERFMODE and
+                    self.ipcmd.link_exists(u)):
+                continue
+            siblings.append((vlanrawdevice, u, vlanid))
+        return siblings
+
+    def _up(self, ifaceobj, ifaceobj_getfunc=None):
         vlanid = self._get_vlan_id(ifaceobj)
         if vlanid == -1:
             raise Exception('could not determine vlanid')
         vlanrawdevice = self._get_vlan_raw_device(ifaceobj)
         if not vlanrawdevice:
             raise Exception('could not determine vlan raw device')
+        if ifaceobj.name in self._vlans_created:
+            self._bridge_vid_add_del(ifaceobj, vlanrawdevice, vlanid)
+            return
         if not ifupdownflags.flags.PERFMODE:
             if not self.ipcmd.link_exists(vlanrawdevice):
                 raise Exception('rawdevice %s not present' %vlanrawdevice)
             if self.ipcmd.link_exists(ifaceobj.name):
                 self._bridge_vid_add_del(ifaceobj, vlanrawdevice, vlanid)
                 return
-        netlink.link_add_vlan(vlanrawdevice, ifaceobj.name, vlanid)
+        vlans = [(vlanrawdevice, ifaceobj.name, vlanid)]
+        # When all interfaces are being brought up, create all the
+        # vlans of this raw device in one batch. The others will only
+        # have their bridge vids configured in their own 'pre-up'
+        if ifupdownflags.flags.ALL and ifaceobj_getfunc:
+            vlans.extend(self._get_pending_sibling_vlans(ifaceobj,
+                                                         vlanrawdevice,
+                                                         ifaceobj_getfunc))
+        if len(vlans) == 1:
+            netlink.link_add_vlan(vlanrawdevice, ifaceobj.name, vlanid)
+        else:
+            errors = netlink.link_add_vlan_many(vlans)
+            for v in vlans[1:]:
+                if v[1] in errors:
+                    # will be retried in its own 'pre-up'
+                    self.logger.debug('%s: %s' %(v[1], str(errors[v[1]])))
+                else:
+                    self._vlans_created.add(v[1])
+            if ifaceobj.name in errors:
+                raise errors[ifaceobj.name]
         self._bridge_vid_add_del(ifaceobj, vlanrawdevice, vlanid)
 
     def _down(self, ifaceobj):
@@ -206,7 +259,8 @@ class vlan(moduleBase):
         if not self.ipcmd:
             self.ipcmd = iproute2()
 
-    def run(self, ifaceobj, operation, query_ifaceobj=None, **extra_args):
+    def run(self, ifaceobj, operation, query_ifaceobj=None,
+            ifaceobj_getfunc=None, **extra_args):
         """ run vlan configuration on the interface object passed as argument
 
         Args:
@@ -233,5 +287,7 @@ class vlan(moduleBase):
         self._init_command_handlers()
         if operation == 'query-checkcurr':
             op_handler(self, ifaceobj, query_ifaceobj)
+        elif operation == 'pre-up':
+            op_handler(self, ifaceobj, ifaceobj_getfunc=ifaceobj_getfunc)
         else:
             op_handler(self, ifaceobj)
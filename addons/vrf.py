@@ -9,8 +9,9 @@ import signal
 import errno
 import fcntl
 import atexit
-import re
+import socket
 from sets import Set
+from ipaddr import IPAddress
 from ifupdown.iface import *
 from ifupdown.utils import utils
 import ifupdown.policymanager as policymanager
@@ -18,7 +19,6 @@ import ifupdownaddons
 from ifupdown.netlink import netlink
 import ifupdown.ifupdownflags as ifupdownflags
 from ifupdownaddons.modulebase import moduleBase
-from ifupdownaddons.bondutil import bondutil
 from ifupdownaddons.iproute2 import iproute2
 from ifupdownaddons.dhclient import dhclient
 from ifupdownaddons.utilsbase import *
@@ -55,58 +55,18 @@ class vrf(moduleBase):
     def __init__(self, *args, **kargs):
         ifupdownaddons.modulebase.moduleBase.__init__(self, *args, **kargs)
         self.ipcmd = None
-        self.bondcmd = None
         self.dhclientcmd = None
         self.name = self.__class__.__name__
         self.vrf_mgmt_devname = policymanager.policymanager_api.get_module_globals(module_name=self.__class__.__name__, attr='vrf-mgmt-devname')
 
-        if (ifupdownflags.flags.PERFMODE and
-            not (self.vrf_mgmt_devname and os.path.exists('/sys/class/net/%s'
-            %self.vrf_mgmt_devname))):
-            # if perf mode is set (PERFMODE is set at boot), and this is the first
-            # time we are calling ifup at boot (check for mgmt vrf existance at
-            # boot, make sure this is really the first invocation at boot.
-            # ifup is called with PERFMODE at boot multiple times (once for mgmt vrf
-            # and the second time with all auto interfaces). We want to delete
-            # the map file only the first time. This is to avoid accidently
-            # deleting map file with a valid mgmt vrf entry
-            if os.path.exists(self.iproute2_vrf_filename):
-                try:
-                    self.logger.info('vrf: removing file %s'
-                                     %self.iproute2_vrf_filename)
-                    os.remove(self.iproute2_vrf_filename)
-                except Exception, e:
-                    self.logger.debug('vrf: removing file failed (%s)'
-                                      %str(e))
-        try:
-            ip_rules = utils.exec_command('/sbin/ip rule show').splitlines()
-            self.ip_rule_cache = [' '.join(r.split()) for r in ip_rules]
-        except Exception, e:
-            self.ip_rule_cache = []
-            self.logger.warn('vrf: cache v4: %s' % str(e))
-
-        try:
-            ip_rules = utils.exec_command('/sbin/ip -6 rule show').splitlines()
-            self.ip6_rule_cache = [' '.join(r.split()) for r in ip_rules]
-        except Exception, e:
-            self.ip6_rule_cache = []
-            self.logger.warn('vrf: cache v6: %s' % str(e))
-
-        #self.logger.debug("vrf: ip rule cache")
-        #self.logger.info(self.ip_rule_cache)
-
-        #self.logger.info("vrf: ip -6 rule cache")
-        #self.logger.info(self.ip6_rule_cache)
-
-        self.l3mdev_checked = False
+        # rule cache, l3mdev rule detection and iproute2 vrf map are
+        # initialized on first use by an interface with vrf attributes,
+        # so that interfaces without vrfs don't pay for them
+        self._rule_cache_initialized = False
+        self.rule_cache = set()
         self.l3mdev4_rule = False
-        if self._l3mdev_rule(self.ip_rule_cache):
-            self.l3mdev4_rule = True
-            self.l3mdev_checked = True
         self.l3mdev6_rule = False
-        if self._l3mdev_rule(self.ip6_rule_cache):
-            self.l3mdev6_rule = True
-            self.l3mdev_checked = True
+        self.l3mdev_checked = False
         self._iproute2_vrf_map_initialized = False
         self.iproute2_vrf_map = {}
         self.iproute2_vrf_map_fd = None
@@ -126,10 +86,32 @@ class vrf(moduleBase):
         self.vrf_close_socks_on_down = policymanager.policymanager_api.get_module_globals(module_name=self.__class__.__name__, attr='vrf-close-socks-on-down')
         self.warn_on_vrf_map_write_err = True
 
+    def _iproute2_vrf_map_boot_cleanup(self):
+        if (ifupdownflags.flags.PERFMODE and
+            not (self.vrf_mgmt_devname and os.path.exists('/sys/class/net/%s'
+            %self.vrf_mgmt_devname))):
+            # if perf mode is set (PERFMODE is set at boot), and this is the first
+            # time we are calling ifup at boot (check for mgmt vrf existance at
+            # boot, make sure this is really the first invocation at boot.
+            # ifup is called with PERFMODE at boot multiple times (once for mgmt vrf
+            # and the second time with all auto interfaces). We want to delete
+            # the map file only the first time. This is to avoid accidently
+            # deleting map file with a valid mgmt vrf entry
+            if os.path.exists(self.iproute2_vrf_filename):
+                try:
+                    self.logger.info('vrf: removing file %s'
+                                     %self.iproute2_vrf_filename)
+                    os.remove(self.iproute2_vrf_filename)
+                except Exception, e:
+                    self.logger.debug('vrf: removing file failed (%s)'
+                                      %str(e))
+
     def _iproute2_vrf_map_initialize(self, writetodisk=True):
         if self._iproute2_vrf_map_initialized:
             return
 
+        self._iproute2_vrf_map_boot_cleanup()
+
         # XXX: check for vrf reserved overlap in /etc/iproute2/rt_tables
         self.iproute2_vrf_map = {}
         iproute2_vrf_map_force_rewrite = False
@@ -426,103 +408,110 @@ class vrf(moduleBase):
         except Exception, e:
             self.log_error('%s: %s' %(ifacename, str(e)), ifaceobj)
 
-    def _del_vrf_rules(self, vrf_dev_name, vrf_table):
-        pref = 200
-        ip_rule_out_format = '%s: from all %s %s lookup %s'
-        ip_rule_cmd = 'ip %s rule del pref %s %s %s table %s' 
-
-        rule = ip_rule_out_format %(pref, 'oif', vrf_dev_name, vrf_dev_name)
-        if rule in self.ip_rule_cache:
-            rule_cmd = ip_rule_cmd %('', pref, 'oif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-        rule = ip_rule_out_format %(pref, 'iif', vrf_dev_name, vrf_dev_name)
-        if rule in self.ip_rule_cache:
-            rule_cmd = ip_rule_cmd %('', pref, 'iif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-        rule = ip_rule_out_format %(pref, 'oif', vrf_dev_name, vrf_dev_name)
-        if rule in self.ip6_rule_cache:
-            rule_cmd = ip_rule_cmd %('-6', pref, 'oif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-        rule = ip_rule_out_format %(pref, 'iif', vrf_dev_name, vrf_dev_name)
-        if rule in self.ip6_rule_cache:
-            rule_cmd = ip_rule_cmd %('-6', pref, 'iif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-    def _l3mdev_rule(self, ip_rules):
-        for rule in ip_rules:
-            if not re.search(r"\d.*from\s+all\s+lookup\s+\W?l3mdev-table\W?",
-                             rule):
-                continue
-            return True
-        return False
+    # fib rules are cached as (family, pref, table, iifname, oifname)
+    VRF_RULE_PREF = 200
 
     def _rule_cache_fill(self):
-        ip_rules = utils.exec_command('/sbin/ip rule show').splitlines()
-        self.ip_rule_cache = [' '.join(r.split()) for r in ip_rules]
-        self.l3mdev4_rule = self._l3mdev_rule(self.ip_rule_cache)
-        ip_rules = utils.exec_command('/sbin/ip -6 rule show').splitlines()
-        self.ip6_rule_cache = [' '.join(r.split()) for r in ip_rules]
-        self.l3mdev6_rule = self._l3mdev_rule(self.ip6_rule_cache)
+        rule_cache = set()
+        l3mdev4_rule = False
+        l3mdev6_rule = False
+        for family, pref, table, iifname, oifname, l3mdev in netlink.rule_dump():
+            if l3mdev:
+                if family == socket.AF_INET:
+                    l3mdev4_rule = True
+                else:
+                    l3mdev6_rule = True
+                continue
+            rule_cache.add((family, pref, table, iifname, oifname))
+        self.rule_cache = rule_cache
+        self.l3mdev4_rule = l3mdev4_rule
+        self.l3mdev6_rule = l3mdev6_rule
+
+    def _rule_cache_initialize(self):
+        if self._rule_cache_initialized:
+            return
+        self._rule_cache_initialized = True
+        try:
+            self._rule_cache_fill()
+        except Exception, e:
+            self.logger.warn('vrf: rule cache: %s' % str(e))
+        # the kernel adds the l3mdev rules with the first vrf device,
+        # if they are not there yet check again before adding our rules
+        self.l3mdev_checked = self.l3mdev4_rule or self.l3mdev6_rule
+
+    def _rules_modify(self, add, rules):
+        if not rules:
+            return {}
+        if add:
+            errors = netlink.rule_add(rules)
+        else:
+            errors = netlink.rule_del(rules)
+        for rule in rules:
+            if rule in errors:
+                continue
+            if add:
+                self.rule_cache.add(rule[:5])
+            else:
+                self.rule_cache.discard(rule[:5])
+        return errors
+
+    def _del_vrf_rules(self, vrf_dev_name, vrf_table):
+        #Example ip rule
+        #200: from all oif blue lookup blue
+        #200: from all iif blue lookup blue
+        self._rule_cache_initialize()
+        table = int(vrf_table) if vrf_table and str(vrf_table).isdigit() else None
+        rules = [rule + (False,) for rule in sorted(self.rule_cache)
+                 if (rule[1] == self.VRF_RULE_PREF and
+                     vrf_dev_name in (rule[3], rule[4]) and
+                     (table is None or rule[2] == table))]
+        errors = self._rules_modify(False, rules)
+        if errors:
+            raise Exception('; '.join([str(errors[r]) for r in rules
+                                       if r in errors]))
 
     def _add_vrf_rules(self, vrf_dev_name, vrf_table):
-        pref = 200
-        ip_rule_out_format = '%s: from all %s %s lookup %s'
-        ip_rule_cmd = 'ip %s rule add pref %s %s %s table %s' 
+        self._rule_cache_initialize()
         if self.vrf_fix_local_table:
             self.vrf_fix_local_table = False
-            rule = '0: from all lookup local'
-            if rule in self.ip_rule_cache:
-                try:
-                    utils.exec_command('ip rule del pref 0')
-                    utils.exec_command('ip rule add pref 32765 table local')
-                except Exception, e:
-                    self.logger.info('%s: %s' % (vrf_dev_name, str(e)))
-                    pass
-            if rule in self.ip6_rule_cache:
-                try:
-                    utils.exec_command('ip -6 rule del pref 0')
-                    utils.exec_command('ip -6 rule add pref 32765 table local')
-                except Exception, e:
-                    self.logger.info('%s: %s' % (vrf_dev_name, str(e)))
-                    pass
+            # move the local table lookup after our vrf rules:
+            # 0: from all lookup local -> 32765: from all lookup local
+            local_rules = [(family, 0, 255, None, None, False)
+                           for family in (socket.AF_INET, socket.AF_INET6)
+                           if (family, 0, 255, None, None) in self.rule_cache]
+            errors = self._rules_modify(False, local_rules)
+            errors.update(self._rules_modify(True,
+                                             [(r[0], 32765, 255, None, None, False)
+                                              for r in local_rules
+                                              if r not in errors]))
+            for error in errors.values():
+                self.logger.info('%s: %s' % (vrf_dev_name, str(error)))
 
         if not self.l3mdev_checked:
             self._rule_cache_fill()
             self.l3mdev_checked = True
+
+        if not str(vrf_table).isdigit():
+            raise Exception('invalid vrf table id %s' % vrf_table)
+        table = int(vrf_table)
+
         #Example ip rule
         #200: from all oif blue lookup blue
         #200: from all iif blue lookup blue
-
-        rule = ip_rule_out_format %(pref, 'oif', vrf_dev_name, vrf_dev_name)
-        if not self.l3mdev4_rule and rule not in self.ip_rule_cache:
-            rule_cmd = ip_rule_cmd %('', pref, 'oif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-        rule = ip_rule_out_format %(pref, 'iif', vrf_dev_name, vrf_dev_name)
-        if not self.l3mdev4_rule and rule not in self.ip_rule_cache:
-            rule_cmd = ip_rule_cmd %('', pref, 'iif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-        rule = ip_rule_out_format %(pref, 'oif', vrf_dev_name, vrf_dev_name)
-        if not self.l3mdev6_rule and rule not in self.ip6_rule_cache:
-            rule_cmd = ip_rule_cmd %('-6', pref, 'oif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
-
-        rule = ip_rule_out_format %(pref, 'iif', vrf_dev_name, vrf_dev_name)
-        if not self.l3mdev6_rule and rule not in self.ip6_rule_cache:
-            rule_cmd = ip_rule_cmd %('-6', pref, 'iif', vrf_dev_name,
-                                     vrf_dev_name)
-            utils.exec_command(rule_cmd)
+        rules = []
+        for family, l3mdev_rule in ((socket.AF_INET, self.l3mdev4_rule),
+                                    (socket.AF_INET6, self.l3mdev6_rule)):
+            if l3mdev_rule:
+                continue
+            for iifname, oifname in ((None, vrf_dev_name), (vrf_dev_name, None)):
+                if ((family, self.VRF_RULE_PREF, table, iifname, oifname)
+                        not in self.rule_cache):
+                    rules.append((family, self.VRF_RULE_PREF, table,
+                                  iifname, oifname, False))
+        errors = self._rules_modify(True, rules)
+        if errors:
+            raise Exception('; '.join([str(errors[r]) for r in rules
+                                       if r in errors]))
 
     def _is_address_virtual_slaves(self, vrfobj, config_vrfslaves,
                                    vrfslave):
@@ -689,78 +678,75 @@ class vrf(moduleBase):
         except Exception, e:
             self.log_error('%s: %s' %(ifaceobj.name, str(e)), ifaceobj)
 
+    def _get_socket_pids(self, inodes):
+        """ returns the pids of the processes holding one of the sockets
+        with the given inode numbers, from /proc/<pid>/fd """
+        targets = set(['socket:[%d]' %inode for inode in inodes])
+        pids = set()
+        if not targets:
+            return pids
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            try:
+                fds = os.listdir('/proc/%s/fd' %pid)
+            except OSError:
+                continue
+            for fd in fds:
+                try:
+                    if os.readlink('/proc/%s/fd/%s' %(pid, fd)) in targets:
+                        pids.add(int(pid))
+                        break
+                except OSError:
+                    continue
+        return pids
+
+    def _get_ancestor_pids(self, pid):
+        """ returns pid and the pids of all its ancestors, from
+        /proc/<pid>/stat """
+        pids = set()
+        while pid > 0 and pid not in pids:
+            pids.add(pid)
+            try:
+                with open('/proc/%d/stat' %pid) as f:
+                    # pid (comm) state ppid ...
+                    pid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (IOError, IndexError, ValueError):
+                break
+        return pids
+
     def _kill_ssh_connections(self, ifacename):
         try:
+            from nlmanager.sockdiag import TCPF_CONN
             runningaddrsdict = self.ipcmd.addr_get(ifacename)
             if not runningaddrsdict:
                 return
-            iplist = [i.split('/', 1)[0] for i in runningaddrsdict.keys()]
+            iplist = [IPAddress(i.split('/', 1)[0])
+                      for i in runningaddrsdict.keys()]
             if not iplist:
                 return
-            proc=[]
-            #Example output:
-            #ESTAB      0      0      10.0.1.84:ssh       10.0.1.228:45186     
-            #users:(("sshd",pid=2528,fd=3))
-            cmdl = ['/bin/ss', '-t', '-p']
-            for line in utils.exec_commandl(cmdl).splitlines():
-                citems = line.split()
-                addr = None
-                if '%' in citems[3]:
-                    addr = citems[3].split('%')[0]
-                elif ':ssh' in citems[3]:
-                    addr = citems[3].split(':')[0]
-                if not addr:
-                    continue
-                if addr in iplist:
-                    if len(citems) == 6:
-                        proc.append(citems[5].split(',')[1].split('=')[1])
-
+            # connected tcp sockets on the interface addresses that are
+            # bound to a device or are ssh connections
+            sockets = [s for s in netlink.sockets_dump(
+                                    protocols=(socket.IPPROTO_TCP,),
+                                    states=TCPF_CONN)
+                       if s.src in iplist and (s.ifindex or s.sport == 22)]
+            proc = self._get_socket_pids([s.inode for s in sockets])
             if not proc:
                 return
-            pid = None
-            # outpt of '/usr/bin/pstree -Aps <pid>':
-            # 'systemd(1)---sshd(990)---sshd(16112)---sshd(16126)---bash(16127)---sudo(16756)---ifreload(16761)---pstree(16842)\n'
-            # get the above output to following format
-            # ['systemd(1)', 'sshd(990)', 'sshd(16112)', 'sshd(16126)', 'bash(16127)', 'sudo(16756)', 'ifreload(16761)', 'pstree(16850)']
-            pstree = list(reversed(utils.exec_command('/usr/bin/pstree -Aps %s' %os.getpid()).strip().split('---')))
-            for index, process in enumerate(pstree):
-                # check the parent of SSH process to make sure
-                # we don't kill SSH server or systemd process
-                if 'sshd' in process and 'sshd' in pstree[index + 1]:
-                    pid = filter(lambda x: x.isdigit(), process)
-                    break
+            # don't kill our own ssh session, the ssh server or
+            # systemd: spare all the processes we are running under
+            proc = sorted(proc - self._get_ancestor_pids(os.getpid()))
             self.logger.info("%s: killing active ssh sessions: %s"
                              %(ifacename, str(proc)))
 
             if ifupdownflags.flags.DRYRUN:
                 return
             for id in proc:
-                if id != pid:
-                    try:
-                        os.kill(int(id), signal.SIGINT)
-                    except OSError as e:
-                        continue
-
-            # Kill current SSH client
-            if pid in proc:
-                try:
-                    forkret = os.fork()
-                except OSError, e:
-                    self.logger.info("fork error : %s [%d]" % (e.strerror, e.errno))
-                if (forkret == 0):  # The first child.
-                    try:
-                        os.setsid()
-                        self.logger.info("%s: ifreload continuing in the background" %ifacename)
-                    except OSError, (err_no, err_message):
-                        self.logger.info("os.setsid failed: errno=%d: %s" % (err_no, err_message))
-                        self.logger.info("pid=%d  pgid=%d" % (os.getpid(), os.getpgid(0)))
                 try:
-                    self.logger.info("%s: killing our session: %s"
-                                     %(ifacename, str(proc)))
-                    os.kill(int(pid), signal.SIGINT)
-                    return
+                    os.kill(id, signal.SIGINT)
                 except OSError as e:
-                    return
+                    continue
         except Exception, e:
             self.logger.info('%s: %s' %(ifacename, str(e)))
 
@@ -805,11 +791,15 @@ class vrf(moduleBase):
             return
 
         try:
-            utils.exec_command('/bin/ss -aK \"dev == %s\"'
-                               %ifindex)
+            sockets = [s for s in netlink.sockets_dump()
+                       if s.ifindex == int(ifindex)]
+            errors = netlink.sockets_destroy(ifaceobj.name, sockets)
+            for error in errors.values():
+                # sockets may close on their own while we walk them
+                self.logger.info('%s: %s' %(ifaceobj.name, str(error)))
         except Exception, e:
-            self.logger.info('%s: closing socks using ss'
-                             ' failed (%s)\n' %(ifaceobj.name, str(e)))
+            self.logger.info('%s: closing socks failed (%s)\n'
+                             %(ifaceobj.name, str(e)))
             pass
 
     def _down_vrf_dev(self, ifaceobj, vrf_table, ifaceobj_getfunc=None):
@@ -1001,8 +991,6 @@ class vrf(moduleBase):
     def _init_command_handlers(self):
         if not self.ipcmd:
             self.ipcmd = iproute2()
-        if not self.bondcmd:
-            self.bondcmd = bondutil()
         if not self.dhclientcmd:
             self.dhclientcmd = dhclient()
 
@@ -119,6 +119,8 @@ class vxlan(moduleBase):
                 # controller.
                 peers = self.ipcmd.get_vxlan_peers(ifaceobj.name, group)
                 if local and remoteips and local in remoteips:
+                    # remoteips is the config list, do not modify it
+                    remoteips = list(remoteips)
                     remoteips.remove(local)
                 cur_peers = set(peers)
                 if remoteips:
@@ -0,0 +1,217 @@
+#!/usr/bin/python
+#
+# Copyright 2016 Cumulus Networks, Inc. All rights reserved.
+#
+# daemon --
+#    ifupdown2d server and the ifup/ifdown/ifquery/ifreload client side
+#
+# The daemon keeps the python modules, addon modules and policy files
+# loaded, and forks a child per command. The child runs the regular
+# ifupdown2 main() with the client argv, cwd, environment and stdin,
+# and streams its stdout/stderr (including the output of the commands
+# it runs) and exit code back to the client.
+#
+# All messages are a one byte type, a 4 byte length and the payload:
+#   client -> daemon: 'r' json {argv, cwd, env, stdin}
+#   daemon -> client: 'o' stdout data, 'e' stderr data, 'x' exit code
+#
+
+import os
+import sys
+import json
+import errno
+import fcntl
+import select
+import signal
+import socket
+import struct
+import logging
+import StringIO
+import threading
+
+daemon_socket = '/run/network/ifupdown2d.sock'
+
+HEADER_PACK = '>cI'
+HEADER_LEN = struct.calcsize(HEADER_PACK)
+
+def _send_msg(sock, msgtype, data):
+    sock.sendall(struct.pack(HEADER_PACK, msgtype, len(data)) + data)
+
+def _recv_all(sock, length):
+    data = ''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return data
+
+def _recv_msg(sock):
+    (msgtype, length) = struct.unpack(HEADER_PACK,
+                                      _recv_all(sock, HEADER_LEN))
+    return (msgtype, _recv_all(sock, length))
+
+def _reads_stdin(argv):
+    """ true if the command reads the interfaces file from stdin """
+    for i, arg in enumerate(argv):
+        if arg in ['-i', '--interfaces'] and argv[i + 1:i + 2] == ['-']:
+            return True
+        if arg in ['-i-', '--interfaces=-']:
+            return True
+    return False
+
+def run_client(argv, socket_path=daemon_socket):
+    """ run the command in ifupdown2d and exit with its exit code.
+
+    Returns if the daemon is not running or not reachable by this user,
+    so the caller can run the command itself.
+    """
+    if not os.path.exists(socket_path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error:
+        sock.close()
+        return
+
+    request = {'argv': argv,
+               'cwd': os.getcwd(),
+               'env': dict(os.environ),
+               'stdin': sys.stdin.read() if _reads_stdin(argv) else None}
+    try:
+        _send_msg(sock, 'r', json.dumps(request))
+        while True:
+            (msgtype, data) = _recv_msg(sock)
+            if msgtype == 'o':
+                sys.stdout.write(data)
+                sys.stdout.flush()
+            elif msgtype == 'e':
+                sys.stderr.write(data)
+                sys.stderr.flush()
+            elif msgtype == 'x':
+                sys.exit(int(data))
+    except (socket.error, EOFError), e:
+        sys.stderr.write('error: lost connection to ifupdown2d (%s)\n'
+                         %str(e))
+        sys.exit(1)
+
+class ifupdownDaemon():
+    """ serves the ifupdown2 commands sent by run_client on a unix
+    socket, each in a forked child running main(argv) """
+
+    def __init__(self, main, socket_path=daemon_socket):
+        self.main = main
+        self.socket_path = socket_path
+        self.sock = None
+
+    def _bind(self):
+        try:
+            os.unlink(self.socket_path)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+        rundir = os.path.dirname(self.socket_path)
+        if not os.path.exists(rundir):
+            os.makedirs(rundir)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # ifup and friends must run as root: other users can not connect
+        # and fall back to running the command themselves
+        oldmask = os.umask(0177)
+        try:
+            self.sock.bind(self.socket_path)
+        finally:
+            os.umask(oldmask)
+        fcntl.fcntl(self.sock.fileno(), fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+        self.sock.listen(64)
+
+    def serve(self):
+        """ accept and run commands forever """
+        self._bind()
+        # children are reaped by the kernel
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        while True:
+            try:
+                (conn, addr) = self.sock.accept()
+            except socket.error, e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            pid = os.fork()
+            if pid:
+                conn.close()
+                continue
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+            self.sock.close()
+            try:
+                self._run_request(conn)
+            finally:
+                os._exit(0)
+
+    def _pump_output(self, conn, fds, done):
+        """ forward what is written to fds (stdout, stderr pipes) to the
+        client until done is set and nothing is left to read. Commands
+        left running in the background may keep the pipes open """
+        msgtypes = {fds[0]: 'o', fds[1]: 'e'}
+        fds = list(fds)
+        while fds:
+            (readable, w, x) = select.select(fds, [], [], 0.1)
+            if not readable and done.is_set():
+                break
+            for fd in readable:
+                data = os.read(fd, 65536)
+                if not data:
+                    fds.remove(fd)
+                    continue
+                _send_msg(conn, msgtypes[fd], data)
+
+    def _run_request(self, conn):
+        (msgtype, data) = _recv_msg(conn)
+        request = json.loads(data)
+        argv = [str(a) for a in request['argv']]
+
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = argv
+        sys.stdin = StringIO.StringIO(request['stdin'] or '')
+
+        (out_r, out_w) = os.pipe()
+        (err_r, err_w) = os.pipe()
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        os.close(out_w)
+        os.close(err_w)
+        done = threading.Event()
+        pump = threading.Thread(target=self._pump_output,
+                                args=(conn, (out_r, err_r), done))
+        pump.start()
+
+        # logging is set up again by main()
+        root_logger = logging.getLogger()
+        for handler in root_logger.handlers[:]:
+            root_logger.removeHandler(handler)
+
+        exitcode = 0
+        try:
+            self.main(argv)
+        except SystemExit, e:
+            if e.code is None:
+                exitcode = 0
+            elif isinstance(e.code, int):
+                exitcode = e.code
+            else:
+                sys.stderr.write('%s\n' %str(e.code))
+                exitcode = 1
+        except Exception, e:
+            sys.stderr.write('error: %s\n' %str(e))
+            exitcode = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.close(1)
+        os.close(2)
+        done.set()
+        pump.join()
+        _send_msg(conn, 'x', str(exitcode))
+        conn.close()
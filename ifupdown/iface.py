@@ -298,7 +298,7 @@ class ifaceJsonDecoder():
                                             OrderedDict()).items()])
         return iface(attrsdict=ifaceattrdict)
 
-class iface():
+class iface(object):
     """ ifupdown2 iface object class
     Attributes:
         **name**      Name of the interface 
@@ -353,6 +353,22 @@ class iface():
 
     version = '0.1'
 
+    # no per object __dict__: there is one iface object per interface
+    # and per stanza, and they are kept for the whole run
+    __slots__ = ('addr_family', 'auto', 'name', 'addr_method', 'config',
+                 '_config_status', 'state', 'status', 'status_str', 'flags',
+                 'priv_flags', 'module_flags', 'refcnt', 'lowerifaces',
+                 'upperifaces', 'classes', 'env', 'raw_config', 'linkstate',
+                 'type', 'priv_data', 'role', 'realname', 'link_type',
+                 'link_kind', 'link_privflags', 'dependency_type',
+                 'blacklisted', '_config_shared')
+
+    # attributes saved by __getstate__, the others are reset by
+    # __setstate__
+    _state_attrs = ('addr_family', 'auto', 'name', 'addr_method', 'config',
+                    'status_str', 'classes', 'type', 'priv_data', 'realname',
+                    '_config_shared')
+
     def __init__(self, attrsdict={}):
         self.addr_family = []
 
@@ -399,6 +415,10 @@ class iface():
         self.dependency_type = ifaceDependencyType.UNKNOWN
         self.blacklisted = False
 
+        # config is shared with other iface objects (see
+        # copy_shared_config) and must be copied before it is modified
+        self._config_shared = False
+
     def _set_attrs_from_dict(self, attrdict):
         self.auto = attrdict.get('auto', False)
         self.name = attrdict.get('name')
@@ -517,22 +537,48 @@ class iface():
             env[attr_env_name] = attr_value[0]
         self.env = env
 
+    def _unshare_config(self):
+        if self._config_shared:
+            self.config = OrderedDict([(k, list(v))
+                                       for (k, v) in self.config.iteritems()])
+            self._config_shared = False
+
+    def copy_shared_config(self):
+        """ returns a copy of the iface object, the same as a deepcopy
+        (which goes through __getstate__ and __setstate__) would, except
+        that the config is shared between the two objects until one of
+        them modifies it through the iface methods. Used to expand
+        interface range stanzas, where all interfaces have the same
+        config """
+        odict = self.__getstate__()
+        odict['addr_family'] = list(self.addr_family)
+        odict['classes'] = list(self.classes)
+        odict['_config_shared'] = True
+        self._config_shared = True
+        ifaceobj = iface()
+        ifaceobj.__setstate__(odict)
+        return ifaceobj
+
     def update_config(self, attr_name, attr_value):
         """ add attribute name and value to the interface config """
+        self._unshare_config()
         self.config.setdefault(attr_name, []).append(attr_value)
 
     def replace_config(self, attr_name, attr_value):
         """ add attribute name and value to the interface config """
+        self._unshare_config()
         self.config[attr_name] = [attr_value]
 
     def delete_config(self, attr_name):
         """ add attribute name and value to the interface config """
+        self._unshare_config()
         try:
             del self.config[attr_name]
         except:
             pass
 
     def update_config_dict(self, attrdict):
+        self._unshare_config()
         self.config.update(attrdict)
 
     def update_config_with_status(self, attr_name, attr_value, attr_status=0):
@@ -540,6 +586,7 @@ class iface():
         update the config_status dict with status of this attribute config """
         if not attr_value:
             attr_value = ''
+        self._unshare_config()
         self.config.setdefault(attr_name, []).append(attr_value)
         self._config_status.setdefault(attr_name, []).append(attr_status)
         # set global iface state
@@ -553,6 +600,7 @@ class iface():
                                                attr_status=0):
         # set multiple attribute status to zero
         # also updates status only if the attribute is present
+        self._unshare_config()
         for attr_name in attr_names:
             if not ifaceobjorig.get_attr_value_first(attr_name):
                continue
@@ -586,6 +634,7 @@ class iface():
 
     def squash(self, newifaceobj):
         """ This squashes the iface object """
+        self._unshare_config()
         for attrname, attrlist in newifaceobj.config.iteritems():
             # if allready present add it to the list
             # else add it to the end of the dictionary
@@ -593,7 +642,7 @@ class iface():
             if self.config.get(attrname):
                 self.config[attrname].extend(attrlist)
             else:
-                self.config.update([(attrname, attrlist)])
+                self.config.update([(attrname, list(attrlist))])
         # we now support inet and inet6 together
         self.addr_family.extend(newifaceobj.addr_family)
         # if auto %ifacename is not part of the first stanza
@@ -602,29 +651,14 @@ class iface():
             self.auto = True
 
     def __getstate__(self):
-        odict = self.__dict__.copy()
-        del odict['state']
-        del odict['status']
-        del odict['lowerifaces']
-        del odict['upperifaces']
-        del odict['refcnt']
-        del odict['_config_status']
-        del odict['flags']
-        del odict['priv_flags']
-        del odict['module_flags']
-        del odict['raw_config']
-        del odict['linkstate']
-        del odict['env']
-        del odict['link_type']
-        del odict['link_kind']
-        del odict['link_privflags']
-        del odict['role']
-        del odict['dependency_type']
-        del odict['blacklisted']
-        return odict
+        return dict([(attr, getattr(self, attr))
+                     for attr in self._state_attrs])
 
     def __setstate__(self, dict):
-        self.__dict__.update(dict)
+        for (attr, value) in dict.iteritems():
+            # skip attributes of older versions
+            if attr in self.__slots__:
+                setattr(self, attr, value)
         self._config_status = {}
         self.state = ifaceState.NEW
         self.status = ifaceStatus.UNKNOWN
@@ -644,6 +678,7 @@ class iface():
         self.link_privflags = ifaceLinkPrivFlags.UNKNOWN
         self.dependency_type = ifaceDependencyType.UNKNOWN
         self.blacklisted = False
+        self._config_shared = dict.get('_config_shared', False)
 
     def dump_raw(self, logger):
         indent = '  '
@@ -66,6 +66,8 @@ class ifupdownMain(ifupdownBase):
     scripts_dir='/etc/network'
     addon_modules_dir='/usr/share/ifupdown2/addons'
     addon_modules_configfile='/etc/network/ifupdown2/addons.conf'
+    parse_cache_file='/var/tmp/network/ifparsecache'
+    template_cachedir='/var/tmp/network/templatecache'
 
     # iface dictionary in the below format:
     # { '<ifacename>' : [<ifaceobject1>, <ifaceobject2> ..] }
@@ -98,6 +100,18 @@ class ifupdownMain(ifupdownBase):
                               ('down' , []),
                               ('post-down' , [])])
 
+    # Addon modules are instantiated on demand, when an interface being
+    # processed uses one of the attributes they own (from their
+    # _modinfo), or one of the below address methods and link kinds.
+    # Modules that act on interfaces without any of their own
+    # attributes are always loaded.
+    addon_modules_always = ['link', 'address', 'ethtool']
+    addon_modules_by_addr_method = {'dhcp' : ['dhcp'],
+                                    'dhcp6' : ['dhcp'],
+                                    'ppp' : ['ppp']}
+    # modules that work on the ports of interfaces of another module
+    addon_modules_following = {'bridge' : ['mstpctl', 'bridgevlan']}
+
     # For old style /etc/network/ bash scripts
     script_ops = OrderedDict([('pre-up', []),
                                     ('up' , []),
@@ -232,6 +246,12 @@ class ifupdownMain(ifupdownBase):
         self.pp = pprint.PrettyPrinter(indent=4)
         self.modules = OrderedDict({})
         self.module_attrs = {}
+        # registry of all the addon modules: name -> class, and
+        # attribute name -> names of the modules owning it
+        self.module_classes = OrderedDict({})
+        self.module_attr_owners = {}
+        self._modules_load_on_demand = True if self.config.get(
+                        'addon_modules_load_on_demand', '1') == '1' else False
         self.overridden_ifupdown_scripts = []
 
         if self.config.get('addon_python_modules_support', '1') == '1':
@@ -629,6 +649,14 @@ class ifupdownMain(ifupdownBase):
         if not ifacenames:
             ifacenames = self.ifaceobjdict.keys()
 
+        if ops[0] == 'query-running':
+            # no config to look at, the running state may need them all
+            self.load_addon_module_instances(self.module_classes.keys())
+        else:
+            for ifaceobjs in self.ifaceobjdict.values():
+                for ifaceobj in ifaceobjs:
+                    self.load_addon_modules_for_ifaceobj(ifaceobj)
+
         iqueue = deque(ifacenames)
         while iqueue:
             i = iqueue.popleft()
@@ -639,6 +667,11 @@ class ifupdownMain(ifupdownBase):
             if not ifaceobjs:
                 continue
             dependents_processed = False
+            if ops[0] != 'query-running':
+                # dependents created above (bridge ports, vlan
+                # devices not in the config) may need more modules
+                for iobj in ifaceobjs:
+                    self.load_addon_modules_for_ifaceobj(iobj)
 
             # Store all dependency info in the first ifaceobj
             # but get dependency info from all ifaceobjs
@@ -1161,12 +1194,20 @@ class ifupdownMain(ifupdownBase):
     def read_iface_config(self):
         """ Reads default network interface config /etc/network/interfaces. """
         ret = True
+        parse_cache_file = None
+        if self.config.get('interfaces_parse_cache', '1') == '1':
+            parse_cache_file = self.parse_cache_file
+        template_cachedir = None
+        if self.config.get('template_cache', '1') == '1':
+            template_cachedir = self.template_cachedir
         nifaces = networkInterfaces(self.interfacesfile,
                         self.interfacesfileiobuf,
                         self.interfacesfileformat,
                         template_enable=self.config.get('template_enable', 0),
                         template_engine=self.config.get('template_engine'),
-                template_lookuppath=self.config.get('template_lookuppath'))
+                template_lookuppath=self.config.get('template_lookuppath'),
+                template_cachedir=template_cachedir,
+                parse_cache_file=parse_cache_file)
         if self._ifaceobj_squash or self._ifaceobj_squash_internal:
             nifaces.subscribe('iface_found', self._save_iface_squash)
         else:
@@ -1207,48 +1248,86 @@ class ifupdownMain(ifupdownBase):
 
         Default modules_dir is /usr/share/ifupdownmodules
 
+        The modules are only imported here to register the attributes
+        they own. Unless addon_modules_load_on_demand is disabled,
+        they are instantiated later, by load_addon_modules_for_ifaceobj,
+        when an interface needs them.
         """
         self.logger.info('loading builtin modules from %s' %modules_dir)
         self._load_addon_modules_config()
         if not modules_dir in sys.path:
             sys.path.append(modules_dir)
-        try:
-            for op, mlist in self.module_ops.items():
-                for mname in mlist:
-                    if self.modules.get(mname):
-                        continue
-                    mpath = modules_dir + '/' + mname + '.py'
-                    if os.path.exists(mpath):
-                        try:
-                            m = __import__(mname)
-                            mclass = getattr(m, mname)
-                        except:
-                            raise
-                        try:
-                            minstance = mclass()
-                            script_override = minstance.get_overrides_ifupdown_scripts()
-                            self.overridden_ifupdown_scripts.extend(script_override)
-                        except moduleNotSupported, e:
-                            self.logger.info('module %s not loaded (%s)\n'
-                                             %(mname, str(e)))
-                            continue
-                        except:
-                            raise
-                        self.modules[mname] = minstance
-                        try:
-                            self.module_attrs[mname] = minstance.get_modinfo()
-                        except:
-                            pass
-        except: 
-            raise
+        for op, mlist in self.module_ops.items():
+            for mname in mlist:
+                if self.module_classes.get(mname):
+                    continue
+                mpath = modules_dir + '/' + mname + '.py'
+                if not os.path.exists(mpath):
+                    continue
+                m = __import__(mname)
+                mclass = getattr(m, mname)
+                self.module_classes[mname] = mclass
+                modinfo = getattr(mclass, '_modinfo', None)
+                if modinfo:
+                    self.module_attrs[mname] = modinfo
+                    for attrname, attrdict in modinfo.get('attrs', {}).items():
+                        for a in [attrname] + attrdict.get('aliases', []):
+                            self.module_attr_owners.setdefault(a,
+                                                        []).append(mname)
+                self.overridden_ifupdown_scripts.extend(
+                        getattr(mclass, 'overrides_ifupdown_scripts', []))
 
         # Assign all modules to query operations
-        self.module_ops['query-checkcurr'] = self.modules.keys()
-        self.module_ops['query-running'] = self.modules.keys()
-        self.module_ops['query-dependency'] = self.modules.keys()
-        self.module_ops['query'] = self.modules.keys()
-        self.module_ops['query-raw'] = self.modules.keys()
+        self.module_ops['query-checkcurr'] = self.module_classes.keys()
+        self.module_ops['query-running'] = self.module_classes.keys()
+        self.module_ops['query-dependency'] = self.module_classes.keys()
+        self.module_ops['query'] = self.module_classes.keys()
+        self.module_ops['query-raw'] = self.module_classes.keys()
+
+        if self._modules_load_on_demand:
+            self.load_addon_module_instances(self.addon_modules_always)
+        else:
+            self.load_addon_module_instances(self.module_classes.keys())
 
+    def load_addon_module_instances(self, mnames):
+        """ instantiate the addon modules in mnames that are not
+        loaded yet """
+        for mname in mnames:
+            if mname in self.modules:
+                continue
+            mclass = self.module_classes.get(mname)
+            if not mclass:
+                continue
+            try:
+                minstance = mclass()
+            except moduleNotSupported, e:
+                self.logger.info('module %s not loaded (%s)\n'
+                                 %(mname, str(e)))
+                # dont try again
+                del self.module_classes[mname]
+                continue
+            self.logger.debug('loaded module %s' %mname)
+            self.modules[mname] = minstance
+            self.load_addon_module_instances(
+                    self.addon_modules_following.get(mname, []))
+
+    def load_addon_modules_for_ifaceobj(self, ifaceobj):
+        """ instantiate the addon modules ifaceobj needs: the owners of
+        its attributes, and the modules for its address method and kind
+        of link """
+        if len(self.modules) == len(self.module_classes):
+            return
+        mnames = []
+        for attrname in ifaceobj.config.keys():
+            mnames.extend(self.module_attr_owners.get(attrname, []))
+        if ifaceobj.addr_method:
+            mnames.extend(self.addon_modules_by_addr_method.get(
+                                            ifaceobj.addr_method, []))
+        if ifaceobj.type == ifaceType.BRIDGE_VLAN:
+            mnames.append('bridgevlan')
+        elif '.' in ifaceobj.name:
+            mnames.append('vlan')
+        self.load_addon_module_instances(mnames)
 
     def _modules_help(self):
         """ Prints addon modules supported syntax """
@@ -5,8 +5,12 @@
 #
 
 try:
+    import socket
+    from ipaddr import IPAddress
     from ifupdownaddons.utilsbase import utilsBase
+    from ifupdownaddons.cache import linkCache
     import ifupdown.ifupdownflags as ifupdownflags
+    from ifupdown.startuptrace import lazySingleton
 except ImportError, e:
     raise ImportError(str(e) + "- required module not found")
 
@@ -20,8 +24,26 @@ class Netlink(utilsBase):
             import sys
             sys.path.insert(0, '/usr/share/ifupdown2/')
             from nlmanager.nlmanager import NetlinkManager
+            from nlmanager.nlpacket import Link
+            from nlmanager.sockdiag import SockDiagManager
             # this should force the use of the local nlmanager
             self._nlmanager_api = NetlinkManager(extra_debug=False)
+            self._sockdiag_api = SockDiagManager(extra_debug=False)
+            self._bond_attrs_to_ifla = {
+                'mode': Link.IFLA_BOND_MODE,
+                'miimon': Link.IFLA_BOND_MIIMON,
+                'use_carrier': Link.IFLA_BOND_USE_CARRIER,
+                'lacp_rate': Link.IFLA_BOND_AD_LACP_RATE,
+                'xmit_hash_policy': Link.IFLA_BOND_XMIT_HASH_POLICY,
+                'min_links': Link.IFLA_BOND_MIN_LINKS,
+                'num_grat_arp': Link.IFLA_BOND_NUM_PEER_NOTIF,
+                'num_unsol_na': Link.IFLA_BOND_NUM_PEER_NOTIF,
+                'ad_actor_system': Link.IFLA_BOND_AD_ACTOR_SYSTEM,
+                'ad_actor_sys_prio': Link.IFLA_BOND_AD_ACTOR_SYS_PRIO,
+                'lacp_bypass': Link.IFLA_BOND_CL_LACP_BYPASS_ALLOW,
+                'updelay': Link.IFLA_BOND_UPDELAY,
+                'downdelay': Link.IFLA_BOND_DOWNDELAY,
+            }
         except Exception as e:
             self.logger.error('cannot initialize ifupdown2\'s '
                               'netlink manager: %s' % str(e))
@@ -46,6 +68,59 @@ class Netlink(utilsBase):
             raise Exception('netlink: %s: cannot create vlan %s: %s'
                             % (vlanrawdevice, vlanid, str(e)))
 
+    def _get_iface_index_many(self, ifacenames):
+        """ returns a dictionary of ifacename -> ifindex. ifindexes are
+        taken from the link cache, one netlink dump fills in the rest """
+        ifindexmap = {}
+        missing = []
+        for ifacename in ifacenames:
+            try:
+                ifindexmap[ifacename] = int(linkCache.get_attr([ifacename,
+                                                                'ifindex']))
+            except Exception:
+                missing.append(ifacename)
+        if missing:
+            allindexes = self._nlmanager_api.get_iface_index_all()
+            for ifacename in missing:
+                if ifacename in allindexes:
+                    ifindexmap[ifacename] = allindexes[ifacename]
+        return ifindexmap
+
+    def link_add_vlan_many(self, vlans):
+        """ creates all the (vlanrawdevice, ifacename, vlanid) vlans of the
+        list in one batch. Returns a dictionary of ifacename -> error
+        for the vlans that could not be created """
+        for vlanrawdevice, ifacename, vlanid in vlans:
+            self.logger.info('%s: netlink: ip link add link %s name %s type vlan id %s'
+                             % (ifacename, vlanrawdevice, ifacename, vlanid))
+        if ifupdownflags.flags.DRYRUN: return {}
+        errors = {}
+        try:
+            ifindexmap = self._get_iface_index_many(
+                set([v[0] for v in vlans]))
+        except Exception as e:
+            for vlanrawdevice, ifacename, vlanid in vlans:
+                errors[ifacename] = Exception('netlink: %s: cannot get ifindex: %s'
+                                              % (vlanrawdevice, str(e)))
+            return errors
+        nlvlans = []
+        for vlanrawdevice, ifacename, vlanid in vlans:
+            if vlanrawdevice not in ifindexmap:
+                errors[ifacename] = Exception('netlink: %s: cannot get ifindex'
+                                              % vlanrawdevice)
+                continue
+            nlvlans.append((ifindexmap[vlanrawdevice], ifacename, vlanid))
+        try:
+            nlerrors = self._nlmanager_api.link_add_vlan_many(nlvlans)
+        except Exception as e:
+            nlerrors = dict([(v[1], e) for v in nlvlans])
+        for vlanrawdevice, ifacename, vlanid in vlans:
+            if ifacename in nlerrors:
+                errors[ifacename] = Exception('netlink: %s: cannot create vlan %s: %s'
+                                              % (vlanrawdevice, vlanid,
+                                                 str(nlerrors[ifacename])))
+        return errors
+
     def link_add_macvlan(self, ifacename, macvlan_ifacename):
         self.logger.info('%s: netlink: ip link add link %s name %s type macvlan mode private'
                          % (ifacename, ifacename, macvlan_ifacename))
@@ -101,6 +176,213 @@ class Netlink(utilsBase):
             raise Exception('netlink: %s: cannot set %s nomaster: %s'
                             % (ifacename, ifacename, str(e)))
 
+    _bond_mode_num = {'balance-rr': 0,
+                      'active-backup': 1,
+                      'balance-xor': 2,
+                      'broadcast': 3,
+                      '802.3ad': 4,
+                      'balance-tlb': 5,
+                      'balance-alb': 6}
+
+    _bond_xmit_hash_policy_num = {'layer2': 0,
+                                  'layer3+4': 1,
+                                  'layer2+3': 2}
+
+    def _bond_attrs_to_info_data(self, attrs):
+        """ translate bonding sysfs attribute names and values
+        into an IFLA_INFO_DATA dictionary """
+        info_data = {}
+        for attrname, attrval in attrs.items():
+            ifla_attr = self._bond_attrs_to_ifla.get(attrname)
+            if ifla_attr is None:
+                raise Exception('unsupported bond attribute %s' % attrname)
+            if attrname == 'mode':
+                attrval = self._bond_mode_num.get(attrval, attrval)
+            elif attrname == 'xmit_hash_policy':
+                attrval = self._bond_xmit_hash_policy_num.get(attrval, attrval)
+            if attrname != 'ad_actor_system':
+                attrval = int(attrval)
+            info_data[ifla_attr] = attrval
+        return info_data
+
+    def link_add_bond(self, ifacename, attrs, state=None):
+        cmd = 'ip link add %s type bond' % ifacename
+        for attrname, attrval in attrs.items():
+            cmd += ' %s %s' % (attrname, attrval)
+        cmd += ' %s' % state if state else ''
+        self.logger.info('%s: netlink: %s' % (ifacename, cmd))
+        if ifupdownflags.flags.DRYRUN: return
+        try:
+            return self._nlmanager_api.link_add_bond(
+                ifacename, self._bond_attrs_to_info_data(attrs), state=state)
+        except Exception as e:
+            raise Exception('netlink: %s: cannot create or update bond: %s'
+                            % (ifacename, str(e)))
+
+    def link_set_master_many(self, master_dev, slaves, protodown=None):
+        """ enslave the (ifacename, state) tuples of slaves to master_dev
+        in one batch. Raises one exception listing all the slaves that
+        could not be enslaved """
+        for ifacename, state in slaves:
+            self.logger.info('%s: netlink: ip link set dev %s master %s %s'
+                             % (master_dev, ifacename, master_dev,
+                                state if state else ''))
+        if ifupdownflags.flags.DRYRUN: return
+        try:
+            master = self.get_iface_index(master_dev)
+            errors = self._nlmanager_api.link_set_master_many(
+                master, slaves, protodown=protodown)
+        except Exception as e:
+            raise Exception('netlink: %s: cannot enslave %s: %s'
+                            % (master_dev,
+                               ' '.join([s for s, state in slaves]), str(e)))
+        if errors:
+            raise Exception('netlink: %s: cannot enslave %s'
+                            % (master_dev,
+                               ', '.join(['%s (%s)' % (s, str(e))
+                                          for s, e in errors.items()])))
+
+    def _route_modify_gateways(self, op, ifacename, gateways, table=None,
+                               metric=None):
+        for gateway in gateways:
+            cmd = 'ip route %s' % op
+            cmd += ' table %s' % table if table else ''
+            cmd += ' default via %s' % gateway
+            cmd += ' metric %s' % metric if metric else ''
+            self.logger.info('%s: netlink: %s dev %s'
+                             % (ifacename, cmd, ifacename))
+        if ifupdownflags.flags.DRYRUN: return {}
+        errors = {}
+        try:
+            ifindex = self.get_iface_index(ifacename)
+        except Exception as e:
+            return dict([(gw, e) for gw in gateways])
+        nlroutes = {}
+        for gateway in gateways:
+            try:
+                nexthop = IPAddress(gateway)
+                afi = socket.AF_INET if nexthop.version == 4 else socket.AF_INET6
+                nlroutes[(afi, None, 0, nexthop, ifindex,
+                          int(table) if table else None,
+                          int(metric) if metric else None)] = gateway
+            except Exception as e:
+                errors[gateway] = Exception('netlink: %s: invalid gateway %s: %s'
+                                            % (ifacename, gateway, str(e)))
+        try:
+            if op == 'add':
+                nlerrors = self._nlmanager_api.routes_add_get_acks(nlroutes.keys())
+            else:
+                nlerrors = self._nlmanager_api.routes_del_get_acks(nlroutes.keys())
+        except Exception as e:
+            nlerrors = dict([(r, e) for r in nlroutes.keys()])
+        for nlroute, error in nlerrors.items():
+            errors[nlroutes[nlroute]] = Exception('netlink: %s: cannot %s default '
+                                                  'gateway %s: %s'
+                                                  % (ifacename, op,
+                                                     nlroutes[nlroute],
+                                                     str(error)))
+        return errors
+
+    def route_add_gateways(self, ifacename, gateways, table=None, metric=None):
+        """ adds the default routes via gateways on ifacename, in the
+        table id if given, with one ACK per route. Returns a dictionary
+        of gateway -> error for the routes that could not be added """
+        return self._route_modify_gateways('add', ifacename, gateways,
+                                           table=table, metric=metric)
+
+    def route_del_gateways(self, ifacename, gateways, table=None, metric=None):
+        return self._route_modify_gateways('del', ifacename, gateways,
+                                           table=table, metric=metric)
+
+    def rule_dump(self):
+        """ returns the (family, pref, table, iifname, oifname, l3mdev)
+        tuples of all the ipv4 and ipv6 fib rules """
+        rules = []
+        for family in (socket.AF_INET, socket.AF_INET6):
+            try:
+                msgs = self._nlmanager_api.rules_dump(family)
+            except Exception as e:
+                raise Exception('netlink: cannot dump %s rules: %s'
+                                % ('ipv4' if family == socket.AF_INET
+                                   else 'ipv6', str(e)))
+            for msg in msgs or []:
+                rules.append((msg.family,
+                              msg.get_attribute_value(msg.FRA_PRIORITY) or 0,
+                              msg.get_table(),
+                              msg.get_attribute_value(msg.FRA_IIFNAME),
+                              msg.get_attribute_value(msg.FRA_OIFNAME),
+                              bool(msg.get_attribute_value(msg.FRA_L3MDEV))))
+        return rules
+
+    def _rule_modify(self, op, rules):
+        for family, pref, table, iifname, oifname, l3mdev in rules:
+            cmd = 'ip %srule %s' % ('-6 ' if family == socket.AF_INET6 else '',
+                                    op)
+            cmd += ' pref %s' % pref if pref is not None else ''
+            cmd += ' iif %s' % iifname if iifname else ''
+            cmd += ' oif %s' % oifname if oifname else ''
+            cmd += ' table %s' % table if table is not None else ''
+            cmd += ' l3mdev' if l3mdev else ''
+            self.logger.info('netlink: %s' % cmd)
+        if ifupdownflags.flags.DRYRUN: return {}
+        try:
+            if op == 'add':
+                nlerrors = self._nlmanager_api.rules_add_get_acks(rules)
+            else:
+                nlerrors = self._nlmanager_api.rules_del_get_acks(rules)
+        except Exception as e:
+            nlerrors = dict([(r, e) for r in rules])
+        return dict([(rule, Exception('netlink: cannot %s rule pref %s: %s'
+                                      % (op, rule[1], str(error))))
+                     for rule, error in nlerrors.items()])
+
+    def rule_add(self, rules):
+        """ adds the (family, pref, table, iifname, oifname, l3mdev) rules
+        in one batch. Returns a dictionary of rule -> error for the rules
+        that could not be added """
+        return self._rule_modify('add', rules)
+
+    def rule_del(self, rules):
+        return self._rule_modify('del', rules)
+
+    def sockets_dump(self, protocols=(socket.IPPROTO_TCP, socket.IPPROTO_UDP),
+                     states=None):
+        """ returns the ipv4 and ipv6 sockets of the protocols in any of
+        the states bitmask (all states by default) from one sock_diag
+        dump per family and protocol """
+        sockets = []
+        for family in (socket.AF_INET, socket.AF_INET6):
+            for protocol in protocols:
+                try:
+                    if states is None:
+                        sockets.extend(self._sockdiag_api.sockets_dump(family,
+                                                                       protocol))
+                    else:
+                        sockets.extend(self._sockdiag_api.sockets_dump(family,
+                                                                       protocol,
+                                                                       states))
+                except Exception as e:
+                    raise Exception('netlink: cannot dump sockets: %s'
+                                    % str(e))
+        return sockets
+
+    def sockets_destroy(self, ifacename, sockets):
+        """ closes the sockets (from sockets_dump) with SOCK_DESTROY.
+        Returns a dictionary of socket -> error for the sockets that
+        could not be closed """
+        for sock in sockets:
+            self.logger.info('%s: netlink: ss -K src %s sport = %s dst %s dport = %s'
+                             % (ifacename, sock.src, sock.sport,
+                                sock.dst, sock.dport))
+        if ifupdownflags.flags.DRYRUN or not sockets: return {}
+        try:
+            errors = self._sockdiag_api.sockets_destroy(sockets)
+        except Exception as e:
+            errors = dict([(sock, e) for sock in sockets])
+        return dict([(sock, Exception('netlink: %s: cannot close socket %s: %s'
+                                      % (ifacename, str(sock), str(error))))
+                     for sock, error in errors.items()])
+
     def link_add_bridge_vlan(self, ifacename, vlanid):
         self.logger.info('%s: netlink: bridge vlan add vid %s dev %s'
                          % (ifacename, vlanid, ifacename))
@@ -146,4 +428,4 @@ class Netlink(utilsBase):
             raise Exception('netlink: %s: cannot create vxlan %s: %s'
                             % (ifacename, vxlanid, str(e)))
 
-netlink = Netlink()
+netlink = lazySingleton('netlink', Netlink)
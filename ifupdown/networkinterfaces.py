@@ -12,13 +12,17 @@ import logging
 import glob
 import re
 import os
-import copy
+import marshal
+import hashlib
 from utils import utils
 from iface import *
-from template import templateEngine
+from template import templateEngine, lookuppath_files
 
 whitespaces = '\n\t\r '
 
+# leading whitespace of an interfaces file, not counted in line numbers
+_leading_ws_regex = re.compile(r'\s*')
+
 class networkInterfaces():
     """ debian ifupdown /etc/network/interfaces file parser """
 
@@ -27,13 +31,17 @@ class networkInterfaces():
     callbacks = {}
     auto_all = False
 
+    # marshal format of the parse cache file
+    _parse_cache_version = 2
+
     _addrfams = {'inet' : ['static', 'manual', 'loopback', 'dhcp', 'dhcp6', 'ppp' ],
                  'inet6' : ['static', 'manual', 'loopback', 'dhcp', 'dhcp6', 'ppp' ]}
 
     def __init__(self, interfacesfile='/etc/network/interfaces',
                  interfacesfileiobuf=None, interfacesfileformat='native',
                  template_enable='0', template_engine=None,
-                 template_lookuppath=None):
+                 template_lookuppath=None, template_cachedir=None,
+                 parse_cache_file=None):
         """This member function initializes the networkinterfaces parser object.
 
         Kwargs:
@@ -47,6 +55,10 @@ class networkInterfaces():
 
             **template_lookuppath** (str): template lookup path
 
+            **template_cachedir** (str): directory caching the compiled templates and their output (default is no cache)
+
+            **parse_cache_file** (str): file caching the parsed records of every interfaces file read, reused while their mtime, size, content and template inputs are unchanged (default is no cache)
+
         Raises:
             AttributeError, KeyError """
 
@@ -65,10 +77,19 @@ class networkInterfaces():
         self._template_enable = template_enable
         self._template_engine_name = template_engine
         self._template_engine_path = template_lookuppath
+        self._template_cachedir = template_cachedir
+
+        # auto_ifaces as a set, for lookups
+        self._auto_ifacenames = set(self.auto_ifaces)
 
         self._currentfile_has_template = False
         self._ws_split_regex = re.compile(r'[\s\t]\s*')
 
+        self.parse_cache_file = parse_cache_file
+        self._parse_cache = None
+        self._parse_cache_dirty = False
+        self._template_inputs_key = None
+
         self.errors = 0
         self.warns = 0
 
@@ -134,77 +155,95 @@ class networkInterfaces():
             return 1
         return 0
 
-    def process_allow(self, lines, cur_idx, lineno):
-        allow_line = lines[cur_idx]
+    def _tokenize(self, filedata):
+        """ yields (lineno, line, words) for every line of filedata that is
+        not blank or a comment: the stripped line and its first word and
+        the rest of the line.
+
+        Walks the file buffer line by line in a single pass, without
+        splitting it into a list of lines """
+        if '\\' in filedata:
+            # process line continuations
+            filedata = ' '.join(d.strip() for d in filedata.split('\\'))
+            pos = 0
+        else:
+            pos = _leading_ws_regex.match(filedata).end()
+        split = self._ws_split_regex.split
+        find = filedata.find
+        end = len(filedata)
+        lineno = 0
+        while pos <= end:
+            eol = find('\n', pos)
+            if eol < 0:
+                eol = end
+            lineno += 1
+            line = filedata[pos:eol].strip(whitespaces)
+            pos = eol + 1
+            if not line or line[0] == '#':
+                continue
+            yield (lineno, line, split(line, 1))
 
-        words = re.split(self._ws_split_regex, allow_line)
+    def process_allow(self, records, tokens, lineno, line):
+        allow_line = line
+
+        words = self._ws_split_regex.split(allow_line)
         if len(words) <= 1:
             raise Exception('invalid allow line \'%s\' at line %d'
                             %(allow_line, lineno))
 
         allow_class = words[0].split('-')[1]
         ifacenames = words[1:]
+        records.append(('allow', allow_class, ifacenames))
+        return next(tokens, None)
 
-        if self.allow_classes.get(allow_class):
-            for i in ifacenames:
-                self.allow_classes[allow_class].append(i)
-        else:
-                self.allow_classes[allow_class] = ifacenames
-        return 0
-
-    def process_source(self, lines, cur_idx, lineno):
-        # Support regex
-        self.logger.debug('processing sourced line ..\'%s\'' %lines[cur_idx])
-        sourced_file = re.split(self._ws_split_regex, lines[cur_idx], 2)[1]
+    def process_source(self, records, tokens, lineno, line):
+        sourced_file = self._ws_split_regex.split(line, 2)[1]
         if sourced_file:
-            filenames = glob.glob(sourced_file)
-            if not filenames:
-                if '*' not in sourced_file:
-                    self._parse_warn(self._currentfile, lineno,
-                            'cannot find source file %s' %sourced_file)
-                return 0
-            for f in filenames:
-                self.read_file(f)
+            records.append(('source', lineno, line, sourced_file))
         else:
-            self._parse_error(self._currentfile, lineno,
-                    'unable to read source line')
-        return 0
+            records.append(('error', lineno, 'unable to read source line'))
+        return next(tokens, None)
 
-    def process_auto(self, lines, cur_idx, lineno):
-        auto_ifaces = re.split(self._ws_split_regex, lines[cur_idx])[1:]
+    def process_auto(self, records, tokens, lineno, line):
+        auto_ifaces = self._ws_split_regex.split(line)[1:]
         if not auto_ifaces:
-            self._parse_error(self._currentfile, lineno,
-                    'invalid auto line \'%s\''%lines[cur_idx])
-            return 0
+            records.append(('error', lineno,
+                            'invalid auto line \'%s\''%line))
+            return next(tokens, None)
+        auto_all = False
+        ifacenames = []
         for a in auto_ifaces:
             if a == 'all':
-                self.auto_all = True
+                auto_all = True
                 break
             r = utils.parse_iface_range(a)
             if r:
                 if len(r) == 3:
                     # eg swp1.[2-4], r = "swp1.", 2, 4)
                     for i in range(r[1], r[2]+1):
-                        self.auto_ifaces.append('%s%d' %(r[0], i))
+                        ifacenames.append('%s%d' %(r[0], i))
                 elif len(r) == 4:
                     for i in range(r[1], r[2]+1):
                         # eg swp[2-4].100, r = ("swp", 2, 4, ".100")
-                        self.auto_ifaces.append('%s%d%s' %(r[0], i, r[3]))
-            self.auto_ifaces.append(a)
-        return 0
+                        ifacenames.append('%s%d%s' %(r[0], i, r[3]))
+            ifacenames.append(a)
+        records.append(('auto', auto_all, ifacenames))
+        return next(tokens, None)
 
     def _add_to_iface_config(self, ifacename, iface_config, attrname,
                              attrval, lineno):
-        newattrname = attrname.replace("_", "-")
-        try:
-            if not self.callbacks.get('validateifaceattr')(newattrname,
-                                      attrval):
-                self._parse_error(self._currentfile, lineno,
-                        'iface %s: unsupported keyword (%s)'
-                        %(ifacename, attrname))
-                return
-        except:
-            pass
+        # the same few attribute names are used by all interfaces
+        newattrname = intern(attrname.replace("_", "-"))
+        validateifaceattr = self.callbacks.get('validateifaceattr')
+        if validateifaceattr:
+            try:
+                if not validateifaceattr(newattrname, attrval):
+                    self._parse_error(self._currentfile, lineno,
+                            'iface %s: unsupported keyword (%s)'
+                            %(ifacename, attrname))
+                    return
+            except:
+                pass
         attrvallist = iface_config.get(newattrname, [])
         if newattrname in ['scope', 'netmask', 'broadcast', 'preferred-lifetime']:
             # For attributes that are related and that can have multiple
@@ -228,18 +267,17 @@ class networkInterfaces():
         else:
             iface_config[newattrname].append(attrval)
 
-    def parse_iface(self, lines, cur_idx, lineno, ifaceobj):
-        lines_consumed = 0
-        line_idx = cur_idx
-
-        iface_line = lines[cur_idx].strip(whitespaces)
-        iface_attrs = re.split(self._ws_split_regex, iface_line)
+    def parse_iface(self, records, tokens, lineno, line, keyword):
+        """ parses the stanza starting at line, returns the token of
+        the line following it """
+        iface_line = line
+        iface_attrs = self._ws_split_regex.split(iface_line)
         ifacename = iface_attrs[1]
 
         if (not utils.is_ifname_range(ifacename) and
             utils.check_ifname_size_invalid(ifacename)):
-            self._parse_warn(self._currentfile, lineno,
-                             '%s: interface name too long' %ifacename)
+            records.append(('warn', lineno,
+                            '%s: interface name too long' %ifacename))
 
         # in cases where mako is unable to render the template
         # or incorrectly renders it due to user template
@@ -249,62 +287,46 @@ class networkInterfaces():
         # we try to warn the user of such cases by looking for
         # variable patterns ('$') in interface names.
         if '$' in ifacename:
-           self._parse_warn(self._currentfile, lineno,
-                    '%s: unexpected characters in interface name' %ifacename)
-
-        ifaceobj.raw_config.append(iface_line)
-        iface_config = collections.OrderedDict()
-        for line_idx in range(cur_idx + 1, len(lines)):
-            l = lines[line_idx].strip(whitespaces)
-            if self.ignore_line(l) == 1:
-                continue
-            attrs = re.split(self._ws_split_regex, l, 1)
-            if self._is_keyword(attrs[0]):
-                line_idx -= 1
+            records.append(('warn', lineno,
+                    '%s: unexpected characters in interface name' %ifacename))
+
+        raw_config = [iface_line]
+        attrs = []
+        next_token = None
+        for token in tokens:
+            (attrlineno, l, attrs_split) = token
+            if self._is_keyword(attrs_split[0]):
+                next_token = token
                 break
             # if not a keyword, every line must have at least a key and value
-            if len(attrs) < 2:
-                self._parse_error(self._currentfile, line_idx,
-                        'iface %s: invalid syntax \'%s\'' %(ifacename, l))
+            if len(attrs_split) < 2:
+                # reported in order with the attribute errors
+                attrs.append((None, 'iface %s: invalid syntax \'%s\''
+                              %(ifacename, l), attrlineno))
                 continue
-            ifaceobj.raw_config.append(l)
-            attrname = attrs[0]
+            raw_config.append(l)
+            (attrname, attrval) = attrs_split
             # preprocess vars (XXX: only preprocesses $IFACE for now)
-            attrval = re.sub(r'\$IFACE', ifacename, attrs[1])
-            self._add_to_iface_config(ifacename, iface_config, attrname,
-                                      attrval, line_idx+1)
-        lines_consumed = line_idx - cur_idx
-
-        # Create iface object
-        if ifacename.find(':') != -1:
-            ifaceobj.name = ifacename.split(':')[0]
-        else:
-            ifaceobj.name = ifacename
-
-        ifaceobj.config = iface_config
-        ifaceobj.generate_env()
+            if '$IFACE' in attrval:
+                attrval = attrval.replace('$IFACE', ifacename)
+            attrs.append((attrname, attrval, attrlineno))
 
+        addr_family = None
+        addr_method = None
         try:
-            if iface_attrs[2]:
-                ifaceobj.addr_family.append(iface_attrs[2])
-            ifaceobj.addr_method = iface_attrs[3]
+            addr_family = iface_attrs[2]
+            addr_method = iface_attrs[3]
         except IndexError:
             # ignore
             pass
-        self._validate_addr_family(ifaceobj, lineno)
 
-        if self.auto_all or (ifaceobj.name in self.auto_ifaces):
-            ifaceobj.auto = True
-
-        classes = self.get_allow_classes_for_iface(ifaceobj.name)
-        if classes:
-            [ifaceobj.set_class(c) for c in classes]
-        
-        return lines_consumed       # Return next index
+        records.append((keyword, lineno, ifacename, addr_family,
+                        addr_method, raw_config, attrs))
+        return next_token
 
     def _create_ifaceobj_clone(self, ifaceobj, newifaceobjname,
                                newifaceobjtype, newifaceobjflags):
-        ifaceobj_new = copy.deepcopy(ifaceobj)
+        ifaceobj_new = ifaceobj.copy_shared_config()
         ifaceobj_new.realname = '%s' %ifaceobj.name
         ifaceobj_new.name = newifaceobjname
         ifaceobj_new.type = newifaceobjtype
@@ -312,71 +334,11 @@ class networkInterfaces():
 
         return ifaceobj_new
 
-    def process_iface(self, lines, cur_idx, lineno):
-        ifaceobj = iface()
-        lines_consumed = self.parse_iface(lines, cur_idx, lineno, ifaceobj)
+    def process_iface(self, records, tokens, lineno, line):
+        return self.parse_iface(records, tokens, lineno, line, 'iface')
 
-        range_val = utils.parse_iface_range(ifaceobj.name)
-        if range_val:
-            if len(range_val) == 3:
-                for v in range(range_val[1], range_val[2]+1):
-                    ifacename = '%s%d' %(range_val[0], v)
-                    if utils.check_ifname_size_invalid(ifacename):
-                        self._parse_warn(self._currentfile, lineno,
-                                         '%s: interface name too long' %ifacename)
-                    flags = iface.IFACERANGE_ENTRY
-                    if v == range_val[1]:
-                        flags |= iface.IFACERANGE_START
-                    ifaceobj_new = self._create_ifaceobj_clone(ifaceobj,
-                                        ifacename, ifaceobj.type, flags)
-                    self.callbacks.get('iface_found')(ifaceobj_new)
-            elif len(range_val) == 4:
-                for v in range(range_val[1], range_val[2]+1):
-                    ifacename = '%s%d%s' %(range_val[0], v, range_val[3])
-                    if utils.check_ifname_size_invalid(ifacename):
-                        self._parse_warn(self._currentfile, lineno,
-                                         '%s: interface name too long' %ifacename)
-                    flags = iface.IFACERANGE_ENTRY
-                    if v == range_val[1]:
-                        flags |= iface.IFACERANGE_START
-                    ifaceobj_new = self._create_ifaceobj_clone(ifaceobj,
-                                        ifacename, ifaceobj.type, flags)
-                    self.callbacks.get('iface_found')(ifaceobj_new)
-        else:
-            self.callbacks.get('iface_found')(ifaceobj)
-
-        return lines_consumed       # Return next index
-
-    def process_vlan(self, lines, cur_idx, lineno):
-        ifaceobj = iface()
-        lines_consumed = self.parse_iface(lines, cur_idx, lineno, ifaceobj)
-
-        range_val = utils.parse_iface_range(ifaceobj.name)
-        if range_val:
-            if len(range_val) == 3:
-                for v in range(range_val[1], range_val[2]+1):
-                    flags = iface.IFACERANGE_ENTRY
-                    if v == range_val[1]:
-                        flags |= iface.IFACERANGE_START
-                    ifaceobj_new = self._create_ifaceobj_clone(ifaceobj,
-                                        '%s%d' %(range_val[0], v),
-                                        ifaceType.BRIDGE_VLAN, flags)
-                    self.callbacks.get('iface_found')(ifaceobj_new)
-            elif len(range_val) == 4:
-                for v in range(range_val[1], range_val[2]+1):
-                    flags = iface.IFACERANGE_ENTRY
-                    if v == range_val[1]:
-                        flags |= iface.IFACERANGE_START
-                    ifaceobj_new = self._create_ifaceobj_clone(ifaceobj,
-                                        '%s%d%s' %(range_val[0], v, range_val[3]),
-                                        ifaceType.BRIDGE_VLAN,
-                                        flags)
-                    self.callbacks.get('iface_found')(ifaceobj_new)
-        else:
-            ifaceobj.type = ifaceType.BRIDGE_VLAN
-            self.callbacks.get('iface_found')(ifaceobj)
-
-        return lines_consumed       # Return next index
+    def process_vlan(self, records, tokens, lineno, line):
+        return self.parse_iface(records, tokens, lineno, line, 'vlan')
 
     network_elems = { 'source'      : process_source,
                       'allow'      : process_allow,
@@ -385,9 +347,9 @@ class networkInterfaces():
                       'vlan'       : process_vlan}
 
     def _is_keyword(self, str):
-        # The additional split here is for allow- keyword
-        if (str in self.network_elems.keys() or
-            str.split('-')[0] == 'allow'):
+        # The additional check here is for allow- keyword
+        if (str in self.network_elems or str == 'allow' or
+            str.startswith('allow-')):
             return 1
         return 0
 
@@ -402,35 +364,139 @@ class networkInterfaces():
                 classes.append(class_name)
         return classes
 
-    def process_interfaces(self, filedata):
-
-        # process line continuations
-        filedata = ' '.join(d.strip() for d in filedata.split('\\'))
-
-        line_idx = 0
-        lines_consumed = 0
-        raw_config = filedata.split('\n')
-        lines = [l.strip(whitespaces) for l in raw_config]
-        while (line_idx < len(lines)):
-            if self.ignore_line(lines[line_idx]):
-                line_idx += 1
-                continue
-            words = re.split(self._ws_split_regex, lines[line_idx])
-            if not words:
-                line_idx += 1
-                continue
+    def parse_interfaces(self, filedata):
+        """ parses filedata into a list of records, replayed by
+        process_records: ('iface' or 'vlan', lineno, ifacename, family,
+        method, raw config lines, [(attrname, attrval, lineno)], with
+        attrname None for syntax errors),
+        ('auto', auto_all, ifacenames), ('allow', class, ifacenames),
+        ('source', lineno, line, pattern) and ('error' or 'warn',
+        lineno, msg).
+
+        Records only hold what is in filedata (plain lists, tuples and
+        strings), they can be cached with marshal and replayed later """
+
+        records = []
+        tokens = self._tokenize(filedata)
+        token = next(tokens, None)
+        while token:
+            (lineno, line, words) = token
             # Check if first element is a supported keyword
             if self._is_keyword(words[0]):
                 keyword_func = self._get_keyword_func(words[0])
-                lines_consumed = keyword_func(self, lines, line_idx, line_idx+1)
-                line_idx += lines_consumed
+                token = keyword_func(self, records, tokens, lineno, line)
             else:
-                self._parse_error(self._currentfile, line_idx + 1,
-                        'error processing line \'%s\'' %lines[line_idx])
-            line_idx += 1
+                records.append(('error', lineno,
+                        'error processing line \'%s\'' %line))
+                token = next(tokens, None)
+        return records
+
+    def _process_iface_record(self, record):
+        (keyword, lineno, ifacename, addr_family, addr_method,
+         raw_config, attrs) = record
+
+        ifaceobj = iface()
+        ifaceobj.raw_config = list(raw_config)
+        iface_config = collections.OrderedDict()
+        for (attrname, attrval, attrlineno) in attrs:
+            if attrname is None:
+                self._parse_error(self._currentfile, attrlineno, attrval)
+                continue
+            self._add_to_iface_config(ifacename, iface_config, attrname,
+                                      attrval, attrlineno)
+
+        # Create iface object
+        if ifacename.find(':') != -1:
+            ifaceobj.name = ifacename.split(':')[0]
+        else:
+            ifaceobj.name = ifacename
+
+        # the env is generated when needed, by get_env
+        ifaceobj.config = iface_config
+
+        if addr_family:
+            ifaceobj.addr_family.append(intern(addr_family))
+        if addr_method:
+            addr_method = intern(addr_method)
+        ifaceobj.addr_method = addr_method
+        self._validate_addr_family(ifaceobj, lineno)
+
+        if self.auto_all or (ifaceobj.name in self._auto_ifacenames):
+            ifaceobj.auto = True
+
+        classes = self.get_allow_classes_for_iface(ifaceobj.name)
+        if classes:
+            [ifaceobj.set_class(c) for c in classes]
+
+        if keyword == 'vlan':
+            ifacetype = ifaceType.BRIDGE_VLAN
+        else:
+            ifacetype = ifaceobj.type
+
+        range_val = utils.parse_iface_range(ifaceobj.name)
+        if range_val:
+            if len(range_val) == 3:
+                ifacenames = ['%s%d' %(range_val[0], v)
+                              for v in range(range_val[1], range_val[2]+1)]
+            else:
+                ifacenames = ['%s%d%s' %(range_val[0], v, range_val[3])
+                              for v in range(range_val[1], range_val[2]+1)]
+            for ifacename in ifacenames:
+                if (keyword == 'iface' and
+                        utils.check_ifname_size_invalid(ifacename)):
+                    self._parse_warn(self._currentfile, lineno,
+                                     '%s: interface name too long' %ifacename)
+                flags = iface.IFACERANGE_ENTRY
+                if ifacename == ifacenames[0]:
+                    flags |= iface.IFACERANGE_START
+                ifaceobj_new = self._create_ifaceobj_clone(ifaceobj,
+                                    ifacename, ifacetype, flags)
+                self.callbacks.get('iface_found')(ifaceobj_new)
+        else:
+            ifaceobj.type = ifacetype
+            self.callbacks.get('iface_found')(ifaceobj)
+
+    def process_records(self, records):
+        """ acts on the records of parse_interfaces, in order """
+        for record in records:
+            kind = record[0]
+            if kind == 'iface' or kind == 'vlan':
+                self._process_iface_record(record)
+            elif kind == 'auto':
+                if record[1]:
+                    self.auto_all = True
+                self.auto_ifaces.extend(record[2])
+                self._auto_ifacenames.update(record[2])
+            elif kind == 'allow':
+                (kind, allow_class, ifacenames) = record
+                if self.allow_classes.get(allow_class):
+                    for i in ifacenames:
+                        self.allow_classes[allow_class].append(i)
+                else:
+                        self.allow_classes[allow_class] = list(ifacenames)
+            elif kind == 'source':
+                (kind, lineno, line, sourced_file) = record
+                # Support regex
+                self.logger.debug('processing sourced line ..\'%s\'' %line)
+                filenames = glob.glob(sourced_file)
+                if not filenames:
+                    if '*' not in sourced_file:
+                        self._parse_warn(self._currentfile, lineno,
+                                'cannot find source file %s' %sourced_file)
+                    continue
+                for f in filenames:
+                    self.read_file(f)
+            elif kind == 'error':
+                self._parse_error(self._currentfile, record[1], record[2])
+            elif kind == 'warn':
+                self._parse_warn(self._currentfile, record[1], record[2])
+
+    def process_interfaces(self, filedata):
+        self.process_records(self.parse_interfaces(filedata))
         return 0
 
-    def read_filedata(self, filedata):
+    def _render_filedata(self, filedata):
+        """ returns (filedata run through the template engine, errors) """
         self._currentfile_has_template = False
         # run through template engine
         if filedata and '%' in filedata:
@@ -439,21 +505,96 @@ class networkInterfaces():
                     self._template_engine = templateEngine(
                         template_engine=self._template_engine_name,
                         template_enable=self._template_enable,
-                        template_lookuppath=self._template_engine_path)
+                        template_lookuppath=self._template_engine_path,
+                        template_cachedir=self._template_cachedir)
                 rendered_filedata = self._template_engine.render(filedata)
                 if rendered_filedata is filedata:
                     self._currentfile_has_template = False
                 else:
                     self._currentfile_has_template = True
             except Exception, e:
-                self._parse_error(self._currentfile, -1,
+                return (filedata, [('error', -1,
                                   'failed to render template (%s). Continue without template rendering ...'
-                                  % str(e))
-                rendered_filedata = None
+                                  % str(e))])
             if rendered_filedata:
-                self.process_interfaces(rendered_filedata)
-                return
-        self.process_interfaces(filedata)
+                return (rendered_filedata, [])
+        return (filedata, [])
+
+    def _parse_filedata(self, filedata):
+        (filedata, records) = self._render_filedata(filedata)
+        return records + self.parse_interfaces(filedata)
+
+    def read_filedata(self, filedata):
+        self.process_records(self._parse_filedata(filedata))
+
+    def _template_inputs(self):
+        """ what a template rendering depends on besides the file itself:
+        the template settings and the files in the lookup path. Templates
+        that read anything else (files, environment) are not tracked """
+        if self._template_inputs_key is None:
+            key = [self._template_enable, self._template_engine_name,
+                   self._template_engine_path]
+            key.extend(lookuppath_files(self._template_engine_path))
+            self._template_inputs_key = tuple(key)
+        return self._template_inputs_key
+
+    def _parse_cache_load(self):
+        self._parse_cache = {}
+        try:
+            with open(self.parse_cache_file, 'rb') as f:
+                cache = marshal.load(f)
+            if cache.get('version') == self._parse_cache_version:
+                self._parse_cache = cache['files']
+        except (IOError, EOFError, ValueError, TypeError, AttributeError,
+                KeyError):
+            pass
+
+    def _parse_cache_save(self):
+        if not self._parse_cache_dirty:
+            return
+        self._parse_cache_dirty = False
+        # forget files that are gone
+        for filename in self._parse_cache.keys():
+            if not os.path.exists(filename):
+                del self._parse_cache[filename]
+        tmpfile = '%s.%d' %(self.parse_cache_file, os.getpid())
+        try:
+            with open(tmpfile, 'wb') as f:
+                marshal.dump({'version': self._parse_cache_version,
+                              'files': self._parse_cache}, f)
+            os.rename(tmpfile, self.parse_cache_file)
+        except (IOError, OSError), e:
+            # eg ifquery run by a regular user
+            self.logger.debug('unable to save parse cache %s (%s)'
+                              %(self.parse_cache_file, str(e)))
+            try:
+                os.unlink(tmpfile)
+            except OSError:
+                pass
+
+    def _parse_file_cached(self, filename, filedata, st):
+        """ returns the records of filename, from the parse cache if
+        it has an entry with the same mtime, size, content hash and
+        template inputs """
+        if self._parse_cache is None:
+            self._parse_cache_load()
+        digest = hashlib.sha1(filedata).hexdigest()
+        template_inputs = None
+        if '%' in filedata:
+            template_inputs = self._template_inputs()
+        entry = self._parse_cache.get(filename)
+        if (entry and entry[0] == st.st_mtime and entry[1] == st.st_size and
+                entry[2] == digest and entry[3] == template_inputs):
+            self.logger.debug('%s: using cached parse' %filename)
+            self._currentfile_has_template = entry[4]
+            return entry[5]
+        records = self._parse_filedata(filedata)
+        self._parse_cache[filename] = (st.st_mtime, st.st_size, digest,
+                                       template_inputs,
+                                       self._currentfile_has_template,
+                                       records)
+        self._parse_cache_dirty = True
+        return records
 
     def read_file(self, filename, fileiobuf=None):
         if fileiobuf:
@@ -463,12 +604,17 @@ class networkInterfaces():
         self.logger.info('processing interfaces file %s' %filename)
         try:
             with open(filename) as f:
+                st = os.fstat(f.fileno())
                 filedata = f.read()
         except Exception, e:
             self.logger.warn('error processing file %s (%s)',
                              filename, str(e))
             return
-        self.read_filedata(filedata)
+        if self.parse_cache_file:
+            records = self._parse_file_cached(filename, filedata, st)
+        else:
+            records = self._parse_filedata(filedata)
+        self.process_records(records)
         self._filestack.pop()
 
     def read_file_json(self, filename, fileiobuf=None):
@@ -510,5 +656,9 @@ class networkInterfaces():
         if self.interfacesfileformat == 'json':
             return self.read_file_json(self.interfacesfile,
                                        self.interfacesfileiobuf)
-        return self.read_file(self.interfacesfile,
-                              self.interfacesfileiobuf)
+        try:
+            return self.read_file(self.interfacesfile,
+                                  self.interfacesfileiobuf)
+        finally:
+            if self.parse_cache_file:
+                self._parse_cache_save()
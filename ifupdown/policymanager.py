@@ -31,6 +31,7 @@ Provides: an API to retrieve link attributes based on addon module name,
 import json
 import logging
 import glob
+from ifupdown.startuptrace import lazySingleton
 
 class policymanager():
     def __init__(self):
@@ -211,4 +212,4 @@ class policymanager():
         return mod_array
 
 
-policymanager_api = policymanager()
+policymanager_api = lazySingleton('policymanager_api', policymanager)
@@ -13,6 +13,7 @@ from iff import IFF_UP
 from rtnetlink import *
 import os
 import ifupdownmain
+from ifupdown.startuptrace import lazySingleton
 
 class rtnetlinkApi(RtNetlink):
 
@@ -234,4 +235,4 @@ class rtnetlinkApi(RtNetlink):
         for v in vids:
             self.bridge_vlan_add(add, v, dev, ispvid, isuntagged, master)
 
-rtnl_api = rtnetlinkApi(os.getpid())
+rtnl_api = lazySingleton('rtnl_api', lambda: rtnetlinkApi(os.getpid()))
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+#
+# Copyright 2016 Cumulus Networks, Inc. All rights reserved.
+#
+# startuptrace --
+#    startup time tracing and lazily constructed singletons
+#
+
+import sys
+import time
+import __builtin__
+
+# list of [kind, name, depth, seconds] in start order, None when
+# tracing is not enabled
+_trace = None
+_depth = 0
+_start_time = None
+_builtin_import = __builtin__.__import__
+
+def _trace_begin(kind, name):
+    global _depth
+    entry = [kind, name, _depth, 0.0]
+    _trace.append(entry)
+    _depth += 1
+    return (entry, time.time())
+
+def _trace_end(start):
+    global _depth
+    (entry, start_time) = start
+    entry[3] = time.time() - start_time
+    _depth -= 1
+
+def _traced_import(name, *args, **kargs):
+    if name in sys.modules:
+        return _builtin_import(name, *args, **kargs)
+    start = _trace_begin('import', name)
+    try:
+        return _builtin_import(name, *args, **kargs)
+    finally:
+        _trace_end(start)
+
+def enable():
+    """ start recording the time spent in every first import and in the
+    construction of every lazySingleton """
+    global _trace
+    global _start_time
+    if _trace is not None:
+        return
+    _trace = []
+    _start_time = time.time()
+    __builtin__.__import__ = _traced_import
+
+def enabled():
+    return _trace is not None
+
+def report(f=sys.stderr):
+    """ print the startup trace, nested imports indented under the
+    import that triggered them. Times include the nested entries """
+    if _trace is None:
+        return
+    __builtin__.__import__ = _builtin_import
+    f.write('startup trace (ms, nested entries included):\n')
+    for (kind, name, depth, seconds) in _trace:
+        f.write('%9.3f %s%s %s\n' %(seconds * 1000, '  ' * depth, kind, name))
+    f.write('%9.3f total\n' %((time.time() - _start_time) * 1000))
+
+class lazySingleton(object):
+    """ stands for a module level singleton and constructs it on first
+    use:
+
+        netlink = lazySingleton('netlink', Netlink)
+
+    Attribute reads and writes are forwarded to the instance.
+    """
+
+    def __init__(self, name, cls, *args, **kargs):
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_construct'] = (cls, args, kargs)
+        self.__dict__['_lazy_instance'] = None
+
+    def _lazy_get_instance(self):
+        instance = self.__dict__['_lazy_instance']
+        if instance is None:
+            (cls, args, kargs) = self.__dict__['_lazy_construct']
+            if _trace is not None:
+                start = _trace_begin('singleton', self._lazy_name)
+                try:
+                    instance = cls(*args, **kargs)
+                finally:
+                    _trace_end(start)
+            else:
+                instance = cls(*args, **kargs)
+            self.__dict__['_lazy_instance'] = instance
+        return instance
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_get_instance(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._lazy_get_instance(), attr, value)
@@ -10,8 +10,12 @@ import cPickle
 from collections import OrderedDict
 import logging
 import exceptions
+import marshal
 import os
+import struct
+import zlib
 from iface import *
+from ifupdown.startuptrace import lazySingleton
 
 class pickling():
     """ class with helper methods for pickling/unpickling iface objects """
@@ -43,6 +47,81 @@ class pickling():
                 except EOFError: break
                 except: raise
 
+    # journal record header: length and crc32 of the pickled record
+    record_header_pack = '>Ii'
+    record_header_len = struct.calcsize(record_header_pack)
+
+    @classmethod
+    def save_record(cls, f, obj):
+        """ pickle obj as a journal record, with a header to detect
+        records that were not completely written """
+        data = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+        f.write(struct.pack(cls.record_header_pack, len(data),
+                            zlib.crc32(data)) + data)
+
+    @classmethod
+    def load_records(cls, filename):
+        """ load the journal records, up to the first incomplete or
+        corrupted one. Yields (record, offset of the record end) """
+        with open(filename, 'r') as f:
+            offset = 0
+            while True:
+                header = f.read(cls.record_header_len)
+                if len(header) < cls.record_header_len:
+                    break
+                (length, crc) = struct.unpack(cls.record_header_pack, header)
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    break
+                offset += cls.record_header_len + length
+                yield (cPickle.loads(data), offset)
+
+class savedIfaceobjs(object):
+    """ iface objects of an interface that are still pickled in the
+    state file: the open state file and the offset and length of each
+    object """
+
+    __slots__ = ('f', 'locations')
+
+    def __init__(self, f, locations):
+        self.f = f
+        self.locations = locations
+
+    def read(self):
+        """ returns the pickled objects """
+        data = []
+        for (offset, length) in self.locations:
+            self.f.seek(offset)
+            data.append(self.f.read(length))
+        return data
+
+    def load(self):
+        return [cPickle.loads(d) for d in self.read()]
+
+class lazyIfaceobjDict(OrderedDict):
+    """ ordered dict of ifacename -> list of iface objects, that
+    unpickles the iface objects of an interface on first access """
+
+    def __getitem__(self, ifacename):
+        value = OrderedDict.__getitem__(self, ifacename)
+        if isinstance(value, savedIfaceobjs):
+            value = value.load()
+            OrderedDict.__setitem__(self, ifacename, value)
+        return value
+
+    def get(self, ifacename, default=None):
+        if ifacename in self:
+            return self[ifacename]
+        return default
+
+    def get_saved(self, ifacename):
+        """ returns the savedIfaceobjs of the interface, None if its
+        iface objects were loaded """
+        value = OrderedDict.__getitem__(self, ifacename)
+        if isinstance(value, savedIfaceobjs):
+            return value
+        return None
+
 class stateManager():
     """ state manager for managing ifupdown iface obj state
 
@@ -51,6 +130,15 @@ class stateManager():
 
     This class uses pickle to store iface objects.
 
+    The state file holds all iface objects. save_state appends the
+    iface objects of the interfaces changed by the run to the state
+    journal, and rewrites the state file (compaction) only when the
+    journal gets bigger than the state file.
+
+    The state index has the offset and length of the pickled iface
+    objects of each interface in the state file, so that they are
+    unpickled only when asked for.
+
     """
 
     state_dir = '/var/tmp/network/'
@@ -65,12 +153,23 @@ class stateManager():
     state_runlockfile = 'ifstatelock'
     """name of the state run lock file """
 
+    state_journal_filename = 'ifstatejournal'
+    """name of the state journal file """
+
+    state_journal_min_compact_size = 65536
+    """journal size below which the journal is never compacted """
+
+    state_index_filename = 'ifstateindex'
+    """name of the state index file """
+
+    state_index_version = 1
+
     def __init__(self):
         """ Initializes statemanager internal state
 
         which includes a dictionary of last pickled iface objects
         """
-        self.ifaceobjdict = OrderedDict()
+        self.ifaceobjdict = lazyIfaceobjDict()
         self.logger = logging.getLogger('ifupdown.' +
                     self.__class__.__name__)
         if not os.path.exists(self.state_dir):
@@ -78,6 +177,16 @@ class stateManager():
         if not os.path.exists(self.state_rundir):
             os.mkdir(self.state_rundir)
         self.state_file = self.state_dir + self.state_filename
+        self.state_journal = self.state_dir + self.state_journal_filename
+        self.state_index = self.state_dir + self.state_index_filename
+        # false if the state file has no index, it is then rewritten
+        # with one by the next save_state
+        self.state_index_valid = False
+        # names of the interfaces whose iface objects changed since
+        # the state was read
+        self.changed_ifacenames = OrderedDict()
+        # size of the journal records read and applied
+        self.state_journal_size = 0
 
     def save_ifaceobj(self, ifaceobj):
         self.ifaceobjdict.setdefault(ifaceobj.name,
@@ -90,13 +199,66 @@ class stateManager():
             filename (str): name of the state file
         """
 
-        pickle_filename = filename
-        if not pickle_filename:
-            pickle_filename = self.state_file
-        if not os.path.exists(pickle_filename):
+        if filename:
+            if os.path.exists(filename):
+                for ifaceobj in pickling.load(filename):
+                    self.save_ifaceobj(ifaceobj)
+            return
+        if os.path.exists(self.state_file):
+            self._read_state_file()
+        if not os.path.exists(self.state_journal):
+            return
+        # the first journal record is (None, id of the state file the
+        # journal applies to), the others (ifacename, ifaceobjs): the
+        # iface objects that replace the saved ones, none if the
+        # interface is gone
+        records = pickling.load_records(self.state_journal)
+        (header, offset) = next(records, (None, 0))
+        if header != (None, self._get_state_file_id()):
+            # eg the state file was removed or written by an older
+            # version
+            self.logger.debug('ignoring state journal of another state file')
+            return
+        for ((ifacename, ifaceobjs), offset) in records:
+            if ifacename in self.ifaceobjdict:
+                del self.ifaceobjdict[ifacename]
+            if ifaceobjs:
+                self.ifaceobjdict[ifacename] = ifaceobjs
+        self.state_journal_size = offset
+
+    def _read_state_file(self):
+        f = open(self.state_file, 'r')
+        index = self._read_state_index(f)
+        if index is None:
+            self.logger.debug('no index for the state file, reading all ' +
+                              'saved iface objects')
+            f.close()
+            for ifaceobj in pickling.load(self.state_file):
+                self.save_ifaceobj(ifaceobj)
             return
-        for ifaceobj in pickling.load(pickle_filename):
-            self.save_ifaceobj(ifaceobj)
+        for (ifacename, locations) in index:
+            self.ifaceobjdict[ifacename] = savedIfaceobjs(f, locations)
+        self.state_index_valid = True
+
+    def _read_state_index(self, f):
+        """ returns the (ifacename, [(offset, length), ...]) list of the
+        state file open as f, None if the index is missing or is the
+        index of another state file """
+        try:
+            with open(self.state_index, 'rb') as indexf:
+                (version, file_id, index) = marshal.load(indexf)
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+        if (version != self.state_index_version or
+                file_id != self._get_file_id(os.fstat(f.fileno()))):
+            return None
+        return index
+
+    def _save_state_index(self, file_id, index):
+        tmpfile = '%s.tmp' %self.state_index
+        with open(tmpfile, 'wb') as f:
+            marshal.dump((self.state_index_version, file_id, index), f)
+        os.rename(tmpfile, self.state_index)
 
     def get_ifaceobjs(self, ifacename):
         return self.ifaceobjdict.get(ifacename)
@@ -115,10 +277,12 @@ class stateManager():
         if 'up' in op:
             if not old_ifaceobjs:
                 self.ifaceobjdict[ifaceobj.name] = [ifaceobj]
+                self.changed_ifacenames[ifaceobj.name] = True
             else:
                 # If it matches any of the object, return
                 if any(o.compare(ifaceobj) for o in old_ifaceobjs):
                     return
+                self.changed_ifacenames[ifaceobj.name] = True
                 # If it does not match any of the objects, and if
                 # all objs in the list came from the pickled file,
                 # then reset the list and add this object as a fresh one,
@@ -138,23 +302,101 @@ class stateManager():
             oidx = 0
             for o in old_ifaceobjs:
                 if o.compare(ifaceobj):
+                    self.changed_ifacenames[ifaceobj.name] = True
                     old_ifaceobjs.pop(oidx)
                     if not len(old_ifaceobjs):
                         del self.ifaceobjdict[ifaceobj.name]
                     return
                 oidx += 1
 
+    def _save_state_file(self):
+        """ writes all iface objects to the state file and removes the
+        journal """
+        tmpfile = '%s.tmp' %self.state_file
+        index = []
+        with open(tmpfile, 'w') as f:
+            for ifacename in self.ifaceobjdict.keys():
+                # objects never loaded are copied as they are
+                saved = self.ifaceobjdict.get_saved(ifacename)
+                if saved:
+                    data = saved.read()
+                else:
+                    data = [cPickle.dumps(i, cPickle.HIGHEST_PROTOCOL)
+                            for i in self.ifaceobjdict[ifacename]]
+                locations = []
+                for d in data:
+                    locations.append((f.tell(), len(d)))
+                    f.write(d)
+                index.append((ifacename, locations))
+            f.flush()
+            os.fsync(f.fileno())
+            file_id = self._get_file_id(os.fstat(f.fileno()))
+        os.rename(tmpfile, self.state_file)
+        self._save_state_index(file_id, index)
+        self.state_index_valid = True
+        self.state_journal_size = 0
+        # if this is interrupted, the journal left behind is ignored: it
+        # does not apply to the new state file
+        if os.path.exists(self.state_journal):
+            os.unlink(self.state_journal)
+
+    def _get_file_id(self, st):
+        return (st.st_ino, st.st_size, st.st_mtime)
+
+    def _get_state_file_id(self):
+        try:
+            return self._get_file_id(os.stat(self.state_file))
+        except OSError:
+            return None
+
+    def _journal_is_complete(self):
+        """ false if the journal has records that were not read, because
+        it does not apply to the state file or has an incomplete record """
+        try:
+            journal_size = os.path.getsize(self.state_journal)
+        except OSError:
+            journal_size = 0
+        return journal_size == self.state_journal_size
+
+    def _journal_needs_compaction(self):
+        try:
+            journal_size = os.path.getsize(self.state_journal)
+        except OSError:
+            return False
+        if journal_size < self.state_journal_min_compact_size:
+            return False
+        try:
+            return journal_size > os.path.getsize(self.state_file)
+        except OSError:
+            return True
+
+    def _append_journal(self):
+        """ appends a record with the iface objects of every changed
+        interface to the journal """
+        with open(self.state_journal, 'a') as f:
+            if not os.fstat(f.fileno()).st_size:
+                pickling.save_record(f, (None, self._get_state_file_id()))
+            for ifacename in self.changed_ifacenames.keys():
+                pickling.save_record(f, (ifacename,
+                                     self.ifaceobjdict.get(ifacename, [])))
+            f.flush()
+            os.fsync(f.fileno())
+            self.state_journal_size = f.tell()
+
     def save_state(self):
         """ saves state (ifaceobjects) to persistent state file """
 
         try:
-            with open(self.state_file, 'w') as f:
-                if not len(self.ifaceobjdict):
-                    f.truncate(0)
-                    return
+            if self.changed_ifacenames:
                 self.logger.debug('saving state ..')
-                for ifaceobjs in self.ifaceobjdict.values():
-                    [pickling.save_obj(f, i) for i in ifaceobjs]
+                if (not os.path.exists(self.state_file) or
+                        not self.state_index_valid or
+                        not self._journal_is_complete() or
+                        self._journal_needs_compaction()):
+                    self._save_state_file()
+                else:
+                    self._append_journal()
+                self.changed_ifacenames.clear()
             open('%s/%s' %(self.state_rundir, self.state_runlockfile), 'w').close()
         except:
             raise
@@ -185,4 +427,4 @@ class stateManager():
             for ifacename, ifaceobjs in self.ifaceobjdict.items():
                 [i.dump(self.logger) for i in ifaceobjs]
 
-statemanager_api = stateManager()
+statemanager_api = lazySingleton('statemanager_api', stateManager)
@@ -7,46 +7,79 @@
 #    helper class to render templates
 #
 
+import os
 import logging
+import hashlib
 import traceback
 from utils import *
 
+def lookuppath_files(template_lookuppath):
+    """ returns the sorted (path, mtime, size) of all the files under the
+    ':' separated template lookup path """
+    files = []
+    for d in (template_lookuppath or '').split(':'):
+        for (root, dirs, fnames) in os.walk(d):
+            for f in sorted(fnames):
+                path = os.path.join(root, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, st.st_mtime, st.st_size))
+    return files
+
 class templateEngine():
     """ provides template rendering methods """
 
     def __init__(self, template_engine, template_enable='0',
-                 template_lookuppath=None):
+                 template_lookuppath=None, template_cachedir=None):
         self.logger = logging.getLogger('ifupdown.' +
                     self.__class__.__name__)
         self.tclass = None
         self.tclassargs = {}
         self.render = self._render_default
+        self.template_lookuppath = template_lookuppath
+        self.template_cachedir = template_cachedir
+        self._lookuppath_digest = None
+        self._mako_loaded = False
         if template_enable == '0':
             return
         if template_engine == 'mako':
-            try:
-                self.tclass = utils.importName('mako.template', 'Template')
-            except Exception, e:
-                self.logger.warn('unable to load template engine %s (%s)'
-                        %(template_engine, str(e)))
-                pass
-            if template_lookuppath:
-                try:
-                    self.logger.debug('setting template lookuppath to %s'
-                            %template_lookuppath)
-                    lc = utils.importName('mako.lookup', 'TemplateLookup')
-                    self.tclassargs['lookup'] = lc(
-                                directories=template_lookuppath.split(':'))
-                except Exception, e:
-                    self.logger.warn('unable to set template lookup path'
-                                     ' %s (%s): are you sure \'python-mako\''
-                                     'is installed?'
-                                     % (template_lookuppath, str(e)))
+            # mako is imported on the first render that is not served
+            # from the template cache
             self.render = self._render_mako
         else:
             self.logger.info('skip template processing.., ' +
                     'template engine not found')
 
+    def _load_mako(self):
+        if self._mako_loaded:
+            return
+        self._mako_loaded = True
+        try:
+            self.tclass = utils.importName('mako.template', 'Template')
+        except Exception, e:
+            self.logger.warn('unable to load template engine mako (%s)'
+                    %str(e))
+            pass
+        if self.template_lookuppath:
+            try:
+                self.logger.debug('setting template lookuppath to %s'
+                        %self.template_lookuppath)
+                lc = utils.importName('mako.lookup', 'TemplateLookup')
+                lookupargs = {}
+                if self.template_cachedir:
+                    lookupargs['module_directory'] = os.path.join(
+                                        self.template_cachedir, 'modules')
+                self.tclassargs['lookup'] = lc(
+                            directories=self.template_lookuppath.split(':'),
+                            **lookupargs)
+            except Exception, e:
+                self.logger.warn('unable to set template lookup path'
+                                 ' %s (%s): are you sure \'python-mako\''
+                                 'is installed?'
+                                 % (self.template_lookuppath, str(e)))
+
     def _render_default(self, textdata):
         return textdata
 
@@ -55,9 +88,84 @@ class templateEngine():
 
         Returns rendered textdata """
 
+        if self.template_cachedir:
+            try:
+                return self._render_mako_cached(textdata)
+            except (IOError, OSError), e:
+                # eg ifquery run by a regular user
+                self.logger.debug('unable to use template cache %s (%s)'
+                                  %(self.template_cachedir, str(e)))
+        self._load_mako()
         if not self.tclass:
             return textdata
         self.logger.info('template processing on interfaces file ...')
         t = self.tclass(text=textdata, output_encoding='utf-8',
                      lookup=self.tclassargs.get('lookup'))
         return t.render()
+
+    def _get_lookuppath_digest(self):
+        if self._lookuppath_digest is None:
+            self._lookuppath_digest = hashlib.sha1(repr(
+                lookuppath_files(self.template_lookuppath))).hexdigest()
+        return self._lookuppath_digest
+
+    def _write_cachefile(self, filename, data):
+        tmpfile = '%s.%d' %(filename, os.getpid())
+        try:
+            with open(tmpfile, 'wb') as f:
+                f.write(data)
+            os.rename(tmpfile, filename)
+        except:
+            try:
+                os.unlink(tmpfile)
+            except OSError:
+                pass
+            raise
+
+    def _render_mako_cached(self, textdata):
+        """ render textdata with mako, using the template cache directory:
+
+            <sha1 of template>.mako: the template text
+            modules/<sha1 of template>.mako.py: the mako compiled template
+            <sha1 of template and lookup path files>.out: the output
+
+        The output is reused as long as the template and the mtime and
+        size of the files in the lookup path are unchanged, and the
+        compiled template as long as the template is unchanged.
+
+        Returns rendered textdata """
+
+        digest = hashlib.sha1(textdata).hexdigest()
+        outfile = os.path.join(self.template_cachedir, '%s.out'
+                               %hashlib.sha1(digest +
+                                   self._get_lookuppath_digest()).hexdigest())
+        try:
+            with open(outfile, 'rb') as f:
+                self.logger.info('using cached template output %s' %outfile)
+                return f.read()
+        except IOError:
+            pass
+
+        self._load_mako()
+        if not self.tclass:
+            return textdata
+        if not os.path.exists(self.template_cachedir):
+            os.makedirs(self.template_cachedir)
+        # mako only caches the compiled modules of file based templates
+        uri = '%s.mako' %digest
+        templatefile = os.path.join(self.template_cachedir, uri)
+        if not os.path.exists(templatefile):
+            self._write_cachefile(templatefile, textdata)
+        self.logger.info('template processing on interfaces file ...')
+        t = self.tclass(filename=templatefile, uri=uri,
+                        module_directory=os.path.join(self.template_cachedir,
+                                                      'modules'),
+                        output_encoding='utf-8',
+                        lookup=self.tclassargs.get('lookup'))
+        rendered = t.render()
+        try:
+            self._write_cachefile(outfile, rendered)
+        except (IOError, OSError), e:
+            self.logger.debug('unable to save template output %s (%s)'
+                              %(outfile, str(e)))
+        return rendered
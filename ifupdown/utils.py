@@ -11,6 +11,7 @@ import os
 import re
 import shlex
 import fcntl
+import atexit
 import signal
 import logging
 import subprocess
@@ -27,6 +28,91 @@ def signal_handler_f(ps, sig, frame):
     if sig == signal.SIGINT:
         raise KeyboardInterrupt
 
+class batchCoprocess():
+    """ A long-lived '<prog> -force -batch -' coprocess (prog being 'ip',
+    'ip -6' or 'bridge') fed over its stdin.
+
+    Completion and errors are tracked through stderr: in batch mode
+    iproute2 reports every failing line as 'Command failed -:<lineno>'.
+    After each group of commands we send a line with an unknown object,
+    which fails without touching the kernel, so seeing its line number
+    tells us that every command before it has been executed.
+    """
+
+    _sync_cmd = 'ifupdown2-sync'
+    _failed_re = re.compile(r'^Command failed -:(\d+)$')
+
+    # commands sent before each sync, keeps the stdin and stderr
+    # pipes from filling up while we are still writing
+    _max_cmds_per_sync = 128
+
+    def __init__(self, prog):
+        self.prog = prog
+        self.process = None
+        self.lineno = 0
+
+    def _start(self):
+        self.process = subprocess.Popen(shlex.split(self.prog) +
+                                        ['-force', '-batch', '-'],
+                                        stdin=subprocess.PIPE,
+                                        stdout=utils.DEVNULL,
+                                        stderr=subprocess.PIPE,
+                                        close_fds=True)
+        self.lineno = 0
+
+    def _run(self, cmds):
+        lines = {}
+        buf = []
+        for cmd in cmds:
+            self.lineno += 1
+            lines[self.lineno] = cmd
+            buf.append(cmd)
+        self.lineno += 1
+        sync_lineno = self.lineno
+        buf.append(self._sync_cmd)
+        self.process.stdin.write('\n'.join(buf) + '\n')
+        self.process.stdin.flush()
+
+        errors = []
+        errmsg = []
+        while True:
+            line = self.process.stderr.readline()
+            if not line:
+                self.process = None
+                raise Exception('%s batch coprocess exited unexpectedly'
+                                % self.prog)
+            m = self._failed_re.match(line.strip())
+            if not m:
+                errmsg.append(line.strip())
+                continue
+            lineno = int(m.group(1))
+            if lineno == sync_lineno:
+                return errors
+            if lineno in lines:
+                errors.append((lines[lineno], ' '.join(errmsg)))
+            errmsg = []
+
+    def run(self, cmds):
+        """ executes the list of cmds and returns the list of
+        (cmd, error message) tuples of the commands that failed """
+        if not self.process or self.process.poll() is not None:
+            self._start()
+        errors = []
+        for i in range(0, len(cmds), self._max_cmds_per_sync):
+            errors.extend(self._run(cmds[i:i + self._max_cmds_per_sync]))
+        return errors
+
+    def stop(self):
+        if not self.process:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait()
+        except Exception:
+            pass
+        self.process = None
+
+
 class utils():
     logger = logging.getLogger('ifupdown')
     DEVNULL = open(os.devnull, 'w')
@@ -315,4 +401,56 @@ class utils():
                                        stdin=stdin,
                                        stderr=stderr)
 
+    # coprocesses started by exec_batch_commands, by prog
+    _batch_coprocesses = {}
+
+    @classmethod
+    def _stop_batch_coprocesses(cls):
+        for coprocess in cls._batch_coprocesses.values():
+            coprocess.stop()
+        cls._batch_coprocesses = {}
+
+    @classmethod
+    def exec_batch_commands(cls, prog, cmds):
+        """ executes cmds through a persistent '<prog> -force -batch -'
+        coprocess, prog being 'ip', 'ip -6' or 'bridge'.
+
+        All the commands are executed, one exception listing the ones
+        that failed is raised at the end. Falls back to one process per
+        command if the coprocess cannot be used.
+        """
+        if not cmds:
+            return
+        for cmd in cmds:
+            cls._log_command_exec('%s %s' % (prog, cmd), None)
+        if ifupdownflags.flags.DRYRUN:
+            return
+        coprocess = cls._batch_coprocesses.get(prog)
+        if not coprocess:
+            if not cls._batch_coprocesses:
+                atexit.register(cls._stop_batch_coprocesses)
+            coprocess = batchCoprocess(prog)
+            cls._batch_coprocesses[prog] = coprocess
+        try:
+            errors = coprocess.run(cmds)
+        except Exception as e:
+            cls.logger.debug('%s batch coprocess failed (%s), '
+                             'executing commands one by one' % (prog, str(e)))
+            coprocess.stop()
+            errors = []
+            for cmd in cmds:
+                try:
+                    cls._execute_subprocess(shlex.split('%s %s'
+                                                        % (prog, cmd)))
+                except Exception as e:
+                    errors.append((cmd, str(e)))
+        if errors:
+            raise Exception('; '.join(['cmd \'%s %s\' failed: (%s)'
+                                       % (prog, cmd, errmsg)
+                                       for cmd, errmsg in errors]))
+
+    @classmethod
+    def exec_batch_command(cls, prog, cmd):
+        cls.exec_batch_commands(prog, [cmd])
+
 fcntl.fcntl(utils.DEVNULL, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
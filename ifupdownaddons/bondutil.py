@@ -197,6 +197,14 @@ class bondutil(utilsBase):
                 else:
                     raise
 
+    def get_changed_attrs(self, bondname, attrdict):
+        """ returns the attributes of attrdict that differ from
+        the running bond, preserving their order """
+        return OrderedDict([(attrname, attrval)
+                            for attrname, attrval in attrdict.items()
+                            if not self._cache_check([bondname, 'linkinfo',
+                                                      attrname], attrval)])
+
     def set_use_carrier(self, bondname, use_carrier):
         if not use_carrier or (use_carrier != '0' and use_carrier != '1'):
             return
@@ -267,7 +267,7 @@ class iproute2(utilsBase):
         iproute2._cache_fill_done = False
 
     def batch_start(self):
-        self.ipbatcbuf = ''
+        self.ipbatchbuf = ''
         self.ipbatch = True
         self.ipbatch_pause = False
 
@@ -287,7 +287,7 @@ class iproute2(utilsBase):
             self.ipbatch_pause = False
             return
         try:
-            utils.exec_command('ip -force -batch -', stdin=self.ipbatchbuf)
+            utils.exec_batch_commands('ip', self.ipbatchbuf.splitlines())
         except:
             raise
         finally:
@@ -302,7 +302,8 @@ class iproute2(utilsBase):
             self.ipbatch_pause = False
             return
         try:
-            utils.exec_command('bridge -force -batch -', stdin=self.ipbatchbuf)
+            utils.exec_batch_commands('bridge',
+                                      self.ipbatchbuf.splitlines())
         except:
             raise
         finally:
@@ -343,7 +344,7 @@ class iproute2(utilsBase):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         self._cache_update([ifacename, 'addrs', address], {})
 
     def addr_del(self, ifacename, address, broadcast=None,
@@ -361,7 +362,7 @@ class iproute2(utilsBase):
         if scope:
             cmd += 'scope %s' %scope
         cmd += ' dev %s' %ifacename
-        utils.exec_command('ip %s' % cmd)
+        utils.exec_batch_command('ip', cmd)
         self._cache_delete([ifacename, 'addrs', address])
 
     def addr_flush(self, ifacename):
@@ -369,7 +370,7 @@ class iproute2(utilsBase):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         self._cache_delete([ifacename, 'addrs'])
 
     def del_addr_all(self, ifacename, skip_addrs=[]):
@@ -426,7 +427,7 @@ class iproute2(utilsBase):
         if self.ipbatch:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
 
     def link_up(self, ifacename):
         self._link_set_ifflag(ifacename, 'UP')
@@ -451,7 +452,7 @@ class iproute2(utilsBase):
         if self.ipbatch:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         if key not in ['master', 'nomaster']:
             self._cache_update([ifacename, key], value)
 
@@ -464,7 +465,7 @@ class iproute2(utilsBase):
         if self.ipbatch:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         self.link_up(ifacename)
         self._cache_update([ifacename, 'hwaddress'], hwaddress)
 
@@ -502,45 +503,46 @@ class iproute2(utilsBase):
         if not gateway:
            return
         if not vrf:
-            cmd = 'ip route add default via %s' %gateway
+            cmd = 'route add default via %s' %gateway
         else:
-            cmd = 'ip route add table %s default via %s' %(vrf, gateway)
+            cmd = 'route add table %s default via %s' %(vrf, gateway)
         # Add metric
         if metric:
-            cmd += 'metric %s' %metric
+            cmd += ' metric %s' %metric
         cmd += ' dev %s' %ifacename
-        utils.exec_command(cmd)
+        utils.exec_batch_command('ip', cmd)
 
     def route_del_gateway(self, ifacename, gateway, vrf=None, metric=None):
         # delete default gw
         if not gateway:
             return
         if not vrf:
-            cmd = 'ip route del default via %s' %gateway
+            cmd = 'route del default via %s' %gateway
         else:
-            cmd = 'ip route del table %s default via %s' %(vrf, gateway)
+            cmd = 'route del table %s default via %s' %(vrf, gateway)
         if metric:
             cmd += ' metric %s' %metric
         cmd += ' dev %s' %ifacename
-        utils.exec_command(cmd)
+        utils.exec_batch_command('ip', cmd)
 
     def route6_add_gateway(self, ifacename, gateway):
         if not gateway:
             return
-        return utils.exec_command('ip -6 route add default via %s dev %s' %
-                                  (gateway, ifacename))
+        return utils.exec_batch_command('ip -6', 'route add default via %s '
+                                        'dev %s' % (gateway, ifacename))
 
     def route6_del_gateway(self, ifacename, gateway):
         if not gateway:
             return
-        return utils.exec_command('ip -6 route del default via %s dev %s' %
-                                  (gateway, ifacename))
+        return utils.exec_batch_command('ip -6', 'route del default via %s '
+                                        'dev %s' % (gateway, ifacename))
 
     def link_create_vlan(self, vlan_device_name, vlan_raw_device, vlanid):
         if self.link_exists(vlan_device_name):
             return
-        utils.exec_command('ip link add link %s name %s type vlan id %d' %
-                           (vlan_raw_device, vlan_device_name, vlanid))
+        utils.exec_batch_command('ip', 'link add link %s name %s type vlan '
+                                 'id %d' % (vlan_raw_device, vlan_device_name,
+                                            vlanid))
         self._cache_update([vlan_device_name], {})
 
     def link_create_vlan_from_name(self, vlan_device_name):
@@ -559,7 +561,7 @@ class iproute2(utilsBase):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         self._cache_update([name], {})
 
     def get_vxlan_peers(self, dev, svcnodeip):
@@ -627,7 +629,7 @@ class iproute2(utilsBase):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
 
         # XXX: update linkinfo correctly
         self._cache_update([name], {})
@@ -648,10 +650,10 @@ class iproute2(utilsBase):
         return False
 
     def route_add(self, route):
-        utils.exec_command('ip route add %s' % route)
+        utils.exec_batch_command('ip', 'route add %s' % route)
 
     def route6_add(self, route):
-        utils.exec_command('ip -6 route add %s' % route)
+        utils.exec_batch_command('ip -6', 'route add %s' % route)
 
     def get_vlandev_attrs(self, ifacename):
         return (self._cache_get('link', [ifacename, 'link']),
@@ -665,10 +667,12 @@ class iproute2(utilsBase):
 
     def set_vxlandev_learning(self, ifacename, learn):
         if learn == 'on':
-            utils.exec_command('ip link set dev %s type vxlan learning' %ifacename)
+            utils.exec_batch_command('ip', 'link set dev %s type vxlan learning'
+                                     % ifacename)
             self._cache_update([ifacename, 'linkinfo', 'learning'], 'on')
         else:
-            utils.exec_command('ip link set dev %s type vxlan nolearning' %ifacename)
+            utils.exec_batch_command('ip', 'link set dev %s type vxlan nolearning'
+                                     % ifacename)
             self._cache_update([ifacename, 'linkinfo', 'learning'], 'off')
 
     def link_get_linkinfo_attrs(self, ifacename):
@@ -707,7 +711,7 @@ class iproute2(utilsBase):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         self._cache_update([ifacename], {})
 
     def link_delete(self, ifacename):
@@ -717,7 +721,7 @@ class iproute2(utilsBase):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch(cmd)
         else:
-            utils.exec_command('ip %s' % cmd)
+            utils.exec_batch_command('ip', cmd)
         self._cache_invalidate()
 
     def link_get_master(self, ifacename):
@@ -732,18 +736,18 @@ class iproute2(utilsBase):
             return self._cache_get('link', [ifacename, 'master'])
 
     def bridge_port_vids_add(self, bridgeportname, vids):
-        [utils.exec_command('bridge vlan add vid %s dev %s' %
-                            (v, bridgeportname)) for v in vids]
+        utils.exec_batch_commands('bridge', ['vlan add vid %s dev %s' %
+                                             (v, bridgeportname) for v in vids])
 
     def bridge_port_vids_del(self, bridgeportname, vids):
         if not vids:
             return
-        [utils.exec_command('bridge vlan del vid %s dev %s' %
-                            (v, bridgeportname)) for v in vids]
+        utils.exec_batch_commands('bridge', ['vlan del vid %s dev %s' %
+                                             (v, bridgeportname) for v in vids])
 
     def bridge_port_vids_flush(self, bridgeportname, vid):
-        utils.exec_command('bridge vlan del vid %s dev %s' %
-                           (vid, bridgeportname))
+        utils.exec_batch_command('bridge', 'vlan del vid %s dev %s' %
+                                 (vid, bridgeportname))
 
     def bridge_port_vids_get(self, bridgeportname):
         utils.exec_command('/sbin/bridge vlan show %s' % bridgeportname)
@@ -798,16 +802,16 @@ class iproute2(utilsBase):
             self.add_to_batch('vlan add vid %s untagged pvid dev %s' %
                               (pvid, bridgeportname))
         else:
-            utils.exec_command('bridge vlan add vid %s untagged pvid dev %s' %
-                               (pvid, bridgeportname))
+            utils.exec_batch_command('bridge', 'vlan add vid %s untagged pvid '
+                                     'dev %s' % (pvid, bridgeportname))
 
     def bridge_port_pvid_del(self, bridgeportname, pvid):
         if self.ipbatch and not self.ipbatch_pause:
             self.add_to_batch('vlan del vid %s untagged pvid dev %s' %
                               (pvid, bridgeportname))
         else:
-            utils.exec_command('bridge vlan del vid %s untagged pvid dev %s' %
-                               (pvid, bridgeportname))
+            utils.exec_batch_command('bridge', 'vlan del vid %s untagged pvid '
+                                     'dev %s' % (pvid, bridgeportname))
 
     def bridge_port_pvids_get(self, bridgeportname):
         return self.read_file_oneline('/sys/class/net/%s/brport/pvid'
@@ -819,8 +823,9 @@ class iproute2(utilsBase):
             [self.add_to_batch('vlan add vid %s dev %s %s' %
                                (v, bridgeportname, target)) for v in vids]
         else:
-            [utils.exec_command('bridge vlan add vid %s dev %s %s' %
-                                (v, bridgeportname, target)) for v in vids]
+            utils.exec_batch_commands('bridge', ['vlan add vid %s dev %s %s' %
+                                                 (v, bridgeportname, target)
+                                                 for v in vids])
 
     def bridge_vids_del(self, bridgeportname, vids, bridge=True):
         target = 'self' if bridge else ''
@@ -828,8 +833,9 @@ class iproute2(utilsBase):
             [self.add_to_batch('vlan del vid %s dev %s %s' %
                                (v, bridgeportname, target)) for v in vids]
         else:
-            [utils.exec_command('bridge vlan del vid %s dev %s %s' %
-                                (v, bridgeportname, target)) for v in vids]
+            utils.exec_batch_commands('bridge', ['vlan del vid %s dev %s %s' %
+                                                 (v, bridgeportname, target)
+                                                 for v in vids])
 
     def bridge_fdb_add(self, dev, address, vlan=None, bridge=True, remote=None):
         target = 'self' if bridge else ''
@@ -841,8 +847,8 @@ class iproute2(utilsBase):
         if remote:
             dst_str = 'dst %s ' % remote
 
-        utils.exec_command('bridge fdb replace %s dev %s %s %s %s' %
-                           (address, dev, vlan_str, target, dst_str))
+        utils.exec_batch_command('bridge', 'fdb replace %s dev %s %s %s %s' %
+                                 (address, dev, vlan_str, target, dst_str))
 
     def bridge_fdb_append(self, dev, address, vlan=None, bridge=True, remote=None):
         target = 'self' if bridge else ''
@@ -854,8 +860,8 @@ class iproute2(utilsBase):
         if remote:
             dst_str = 'dst %s ' % remote
 
-        utils.exec_command('bridge fdb append %s dev %s %s %s %s' %
-                           (address, dev, vlan_str, target, dst_str))
+        utils.exec_batch_command('bridge', 'fdb append %s dev %s %s %s %s' %
+                                 (address, dev, vlan_str, target, dst_str))
 
     def bridge_fdb_del(self, dev, address, vlan=None, bridge=True, remote=None):
         target = 'self' if bridge else ''
@@ -866,8 +872,8 @@ class iproute2(utilsBase):
         dst_str = ''
         if remote:
             dst_str = 'dst %s ' % remote
-        utils.exec_command('bridge fdb del %s dev %s %s %s %s' %
-                           (address, dev, vlan_str, target, dst_str))
+        utils.exec_batch_command('bridge', 'fdb del %s dev %s %s %s %s' %
+                                 (address, dev, vlan_str, target, dst_str))
 
     def bridge_is_vlan_aware(self, bridgename):
         filename = '/sys/class/net/%s/bridge/vlan_filtering' %bridgename
@@ -300,6 +300,9 @@ class NetlinkManager(object):
                         elif msgtype == RTM_NEWROUTE or msgtype == RTM_DELROUTE:
                             msg = Route(msgtype, nlpacket.debug, use_color=self.use_color)
 
+                        elif msgtype == RTM_NEWRULE or msgtype == RTM_DELRULE:
+                            msg = Rule(msgtype, nlpacket.debug, use_color=self.use_color)
+
                         else:
                             raise Exception("RXed unknown netlink message type %s" % msgtype)
 
@@ -311,6 +314,91 @@ class NetlinkManager(object):
 
                     data = data[length:]
 
+    def tx_nlpackets_get_acks(self, nlpackets):
+        """
+        TX a list of nlpackets, all built with NLM_F_ACK, concatenated in as few
+        send calls as possible and wait for the ACK of every one of them.
+
+        Return a dictionary of seq -> NetlinkError for the packets that failed,
+        an empty dictionary means that every operation succeeded.
+        """
+        PACKET_CONCAT_SIZE = 16384
+        errors = {}
+        chunk = []
+        chunk_length = 0
+
+        for nlpacket in nlpackets:
+            chunk.append(nlpacket)
+            chunk_length += len(nlpacket.message)
+
+            # TX in chunks and drain the ACKs of each chunk before sending the
+            # next one so that our socket receive buffer never overflows
+            if chunk_length >= PACKET_CONCAT_SIZE:
+                errors.update(self._tx_nlpackets_chunk_get_acks(chunk))
+                chunk = []
+                chunk_length = 0
+
+        if chunk:
+            errors.update(self._tx_nlpackets_chunk_get_acks(chunk))
+
+        return errors
+
+    def _tx_nlpackets_chunk_get_acks(self, nlpackets):
+        header_PACK = NetlinkPacket.header_PACK
+        header_LEN = NetlinkPacket.header_LEN
+        pending = set([nlpacket.seq for nlpacket in nlpackets])
+        errors = {}
+        null_read = 0
+        MAX_NULL_READS = 3
+
+        self.tx_nlpacket_raw(''.join([nlpacket.message for nlpacket in nlpackets]))
+
+        while pending:
+
+            if self.shutdown_flag:
+                log.info('shutdown flag is True, exiting')
+                break
+
+            (readable, writeable, exceptional) = select([self.tx_socket, ], [], [self.tx_socket, ], 1)
+
+            if not readable:
+                null_read += 1
+
+                if null_read >= MAX_NULL_READS:
+                    log.info('Socket was not readable for %d attempts, %d ACKs missing' % (null_read, len(pending)))
+                    break
+                continue
+
+            null_read = 0
+            data = self.tx_socket.recv(65536)
+
+            if not data:
+                log.info('RXed zero length data, the socket is closed')
+                break
+
+            while data:
+                (length, msgtype, flags, seq, pid) = unpack(header_PACK, data[:header_LEN])
+
+                if pid == self.pid and seq in pending and msgtype == NLMSG_ERROR:
+                    pending.discard(seq)
+
+                    # The error code is a signed negative number, 0 is an ACK
+                    error_code = abs(unpack('=i', data[header_LEN:header_LEN+4])[0])
+
+                    if error_code:
+                        try:
+                            error_str = os.strerror(error_code)
+                        except ValueError:
+                            error_str = 'code %s' % error_code
+                        errors[seq] = NetlinkError('Operation failed with \'%s\'' % error_str)
+
+                data = data[length:]
+
+        for seq in pending:
+            errors[seq] = NetlinkError('No ACK received')
+
+        return errors
+
     def ip_to_afi(self, ip):
         type_ip = type(ip)
 
@@ -343,6 +431,10 @@ class NetlinkManager(object):
             msg = Route(rtm_type, debug, use_color=self.use_color)
             msg.body = pack('Bxxxii', family, 0, 0)
 
+        elif rtm_type == RTM_GETRULE:
+            msg = Rule(rtm_type, debug, use_color=self.use_color)
+            msg.body = pack('=8BI', family, 0, 0, 0, 0, 0, 0, 0, 0)
+
         else:
             log.error("request_dump RTM_GET %s is not supported" % rtm_type)
             return None
@@ -433,6 +525,72 @@ class NetlinkManager(object):
                    route_type=Route.RTN_UNICAST):
         self._routes_add_or_delete(False, routes, ecmp_routes, table, protocol, route_scope, route_type)
 
+    def _routes_modify_get_acks(self, rtm_command, routes):
+        """
+        routes is a list of (afi, ip, mask, nexthop, interface_index, table, metric)
+        tuples, ip is None for a default route, table and metric may be None.
+
+        Every route is sent with NLM_F_ACK, concatenated with the others, so
+        unlike routes_add/routes_del each route gets its own ACK and tables
+        above 255 (VRF tables) are supported via RTA_TABLE.
+
+        Return a dictionary of route tuple -> NetlinkError for the routes that
+        failed.
+        """
+        debug = rtm_command in self.debug
+        nlpackets = []
+        seq_to_route = {}
+
+        for route_tuple in routes:
+            (afi, ip, mask, nexthop, interface_index, table, metric) = route_tuple
+
+            if table is None:
+                table = Route.RT_TABLE_MAIN
+
+            route = Route(rtm_command, debug, use_color=self.use_color)
+
+            # Same defaults as iproute2: a delete matches any protocol, scope
+            # and type
+            if rtm_command == RTM_NEWROUTE:
+                route.flags = NLM_F_REQUEST | NLM_F_CREATE | NLM_F_EXCL | NLM_F_ACK
+                protocol = Route.RT_PROT_BOOT
+                route_scope = Route.RT_SCOPE_UNIVERSE
+                route_type = Route.RTN_UNICAST
+            else:
+                route.flags = NLM_F_REQUEST | NLM_F_ACK
+                protocol = Route.RT_PROT_UNSPEC
+                route_scope = Route.RT_SCOPE_NOWHERE
+                route_type = Route.RTN_UNSPEC
+
+            # The table ID in the service header is only 8 bits
+            route.body = pack('BBBBBBBBi', afi, mask, 0, 0,
+                              table if table < 256 else Route.RT_TABLE_UNSPEC,
+                              protocol, route_scope, route_type, 0)
+            route.family = afi
+
+            if ip is not None:
+                route.add_attribute(Route.RTA_DST, ip)
+            if nexthop:
+                route.add_attribute(Route.RTA_GATEWAY, nexthop)
+            if interface_index:
+                route.add_attribute(Route.RTA_OIF, interface_index)
+            route.add_attribute(Route.RTA_TABLE, table)
+            if metric is not None:
+                route.add_attribute(Route.RTA_PRIORITY, metric)
+
+            route.build_message(self.sequence.next(), self.pid)
+            nlpackets.append(route)
+            seq_to_route[route.seq] = route_tuple
+
+        errors = self.tx_nlpackets_get_acks(nlpackets)
+        return dict([(seq_to_route[seq], error) for (seq, error) in errors.iteritems()])
+
+    def routes_add_get_acks(self, routes):
+        return self._routes_modify_get_acks(RTM_NEWROUTE, routes)
+
+    def routes_del_get_acks(self, routes):
+        return self._routes_modify_get_acks(RTM_DELROUTE, routes)
+
     def route_get(self, ip, debug=False):
         """
         ip must be one of the following:
@@ -471,6 +629,75 @@ class NetlinkManager(object):
                  str(x.attributes[Route.RTA_GATEWAY].value) if Route.RTA_GATEWAY in x.attributes else None,
                  x.attributes[Route.RTA_OIF].value)
 
+    # =====
+    # Rules
+    # =====
+    def rules_dump(self, family=socket.AF_UNSPEC, debug=False):
+        return self.request_dump(RTM_GETRULE, family, debug)
+
+    def _rules_modify_get_acks(self, rtm_command, rules):
+        """
+        rules is a list of (afi, pref, table, iifname, oifname, l3mdev) tuples,
+        everything but afi may be None. A rule with a table is a 'lookup table'
+        rule, l3mdev is the 'lookup [l3mdev-table]' rule.
+
+        Every rule is sent with NLM_F_ACK, concatenated with the others.
+
+        Return a dictionary of rule tuple -> NetlinkError for the rules that
+        failed.
+        """
+        debug = rtm_command in self.debug
+        nlpackets = []
+        seq_to_rule = {}
+
+        for rule_tuple in rules:
+            (afi, pref, table, iifname, oifname, l3mdev) = rule_tuple
+
+            rule = Rule(rtm_command, debug, use_color=self.use_color)
+
+            # Same defaults as iproute2: a delete matches any action
+            if rtm_command == RTM_NEWRULE:
+                rule.flags = NLM_F_REQUEST | NLM_F_CREATE | NLM_F_EXCL | NLM_F_ACK
+                action = Rule.FR_ACT_TO_TBL
+                if table is None and not l3mdev:
+                    table = Route.RT_TABLE_MAIN
+            else:
+                rule.flags = NLM_F_REQUEST | NLM_F_ACK
+                action = Rule.FR_ACT_UNSPEC
+
+            # The table ID in the service header is only 8 bits
+            if table is None or table >= 256:
+                header_table = Route.RT_TABLE_UNSPEC
+            else:
+                header_table = table
+
+            rule.body = pack('=8BI', afi, 0, 0, 0, header_table, 0, 0, action, 0)
+            rule.family = afi
+
+            if pref is not None:
+                rule.add_attribute(Rule.FRA_PRIORITY, pref)
+            if table is not None:
+                rule.add_attribute(Rule.FRA_TABLE, table)
+            if iifname:
+                rule.add_attribute(Rule.FRA_IIFNAME, iifname)
+            if oifname:
+                rule.add_attribute(Rule.FRA_OIFNAME, oifname)
+            if l3mdev:
+                rule.add_attribute(Rule.FRA_L3MDEV, 1)
+
+            rule.build_message(self.sequence.next(), self.pid)
+            nlpackets.append(rule)
+            seq_to_rule[rule.seq] = rule_tuple
+
+        errors = self.tx_nlpackets_get_acks(nlpackets)
+        return dict([(seq_to_rule[seq], error) for (seq, error) in errors.iteritems()])
+
+    def rules_add_get_acks(self, rules):
+        return self._rules_modify_get_acks(RTM_NEWRULE, rules)
+
+    def rules_del_get_acks(self, rules):
+        return self._rules_modify_get_acks(RTM_DELRULE, rules)
+
     # =====
     # Links
     # =====
@@ -544,6 +771,65 @@ class NetlinkManager(object):
 
         return self._link_add(ifindex, ifname, 'vlan', {Link.IFLA_VLAN_ID: vlanid})
 
+    def link_add_vlan_many(self, vlans):
+        """
+        vlans is a list of (ifindex, ifname, vlanid) tuples where ifindex is
+        the index of the parent interface.  All the RTM_NEWLINK messages are
+        concatenated and TXed together.
+
+        Return a dictionary of ifname -> exception for the vlans that could
+        not be created.
+        """
+        debug = RTM_NEWLINK in self.debug
+        seq_to_ifname = {}
+        nlpackets = []
+        errors = {}
+
+        for (ifindex, ifname, vlanid) in vlans:
+
+            # see link_add_vlan() for why we check this here
+            if '.' in ifname:
+                ifname_vlanid = int(ifname.split('.')[-1])
+
+                if ifname_vlanid != vlanid:
+                    errors[ifname] = InvalidInterfaceNameVlanCombo("Interface %s must belong "
+                                                                   "to VLAN %d (VLAN %d was requested)" %
+                                                                   (ifname, ifname_vlanid, vlanid))
+                    continue
+
+            link = Link(RTM_NEWLINK, debug, use_color=self.use_color)
+            link.flags = NLM_F_CREATE | NLM_F_REQUEST | NLM_F_ACK
+            link.body = pack('Bxxxiii', socket.AF_UNSPEC, 0, 0, 0)
+            link.add_attribute(Link.IFLA_IFNAME, ifname)
+            link.add_attribute(Link.IFLA_LINK, ifindex)
+            link.add_attribute(Link.IFLA_LINKINFO, {
+                Link.IFLA_INFO_KIND: 'vlan',
+                Link.IFLA_INFO_DATA: {Link.IFLA_VLAN_ID: vlanid}
+            })
+            link.build_message(self.sequence.next(), self.pid)
+            seq_to_ifname[link.seq] = ifname
+            nlpackets.append(link)
+
+        for (seq, error) in self.tx_nlpackets_get_acks(nlpackets).iteritems():
+            errors[seq_to_ifname[seq]] = error
+
+        return errors
+
+    def get_iface_index_all(self):
+        """
+        Return a dictionary of ifname -> ifindex for all interfaces,
+        built from a single RTM_GETLINK dump
+        """
+        ifindexmap = {}
+
+        for msg in self.request_dump(RTM_GETLINK, socket.AF_UNSPEC, RTM_GETLINK in self.debug):
+            ifname = msg.get_attribute_value(Link.IFLA_IFNAME)
+
+            if ifname:
+                ifindexmap[ifname] = msg.ifindex
+
+        return ifindexmap
+
     def link_add_macvlan(self, ifindex, ifname):
         """
         ifindex is the index of the parent interface that this sub-interface
@@ -789,6 +1075,94 @@ class NetlinkManager(object):
         link.build_message(self.sequence.next(), self.pid)
         return self.tx_nlpacket_get_response(link)
 
+    def link_add_bond(self, ifname, ifla_info_data, state=None):
+        """
+        Create bond ifname, or update it if it already exists, with all the
+        IFLA_BOND_* attributes in ifla_info_data carried by a single RTM_NEWLINK.
+
+        The kernel applies the bond attributes before the admin state so a bond
+        that had to be taken down for a mode change can be brought back 'up'
+        by the same message.
+        """
+        if state == 'up':
+            if_change = Link.IFF_UP
+            if_flags = Link.IFF_UP
+        elif state == 'down':
+            if_change = Link.IFF_UP
+            if_flags = 0
+        else:
+            if_change = 0
+            if_flags = 0
+
+        debug = RTM_NEWLINK in self.debug
+
+        link = Link(RTM_NEWLINK, debug, use_color=self.use_color)
+        link.flags = NLM_F_CREATE | NLM_F_REQUEST | NLM_F_ACK
+        link.body = pack('=BxxxiLL', socket.AF_UNSPEC, 0, if_flags, if_change)
+        link.add_attribute(Link.IFLA_IFNAME, ifname)
+        link.add_attribute(Link.IFLA_LINKINFO, {
+            Link.IFLA_INFO_KIND: 'bond',
+            Link.IFLA_INFO_DATA: ifla_info_data
+        })
+        link.build_message(self.sequence.next(), self.pid)
+        return self.tx_nlpacket_get_response(link)
+
+    def link_set_master_many(self, master_ifindex, slaves, protodown=None):
+        """
+        Enslave several interfaces to master_ifindex with concatenated messages:
+            ip link set <slave> down [protodown on]
+            ip link set <slave> master <master_ifindex> <state>
+
+        slaves is a list of (ifname, state) tuples where state is 'up', 'down'
+        or None to leave the admin state alone once the slave is enslaved.
+
+        Return a dictionary of ifname -> NetlinkError for the slaves that
+        could not be enslaved.
+        """
+        debug = RTM_NEWLINK in self.debug
+        seq_to_ifname = {}
+        nlpackets = []
+
+        # all the slaves must be down before they can be enslaved
+        for (ifname, state) in slaves:
+            link = Link(RTM_NEWLINK, debug, use_color=self.use_color)
+            link.flags = NLM_F_REQUEST | NLM_F_ACK
+            link.body = pack('=BxxxiLL', socket.AF_UNSPEC, 0, 0, Link.IFF_UP)
+            link.add_attribute(Link.IFLA_IFNAME, ifname)
+            if protodown is not None:
+                link.add_attribute(Link.IFLA_PROTO_DOWN, 1 if protodown else 0)
+            link.build_message(self.sequence.next(), self.pid)
+            seq_to_ifname[link.seq] = ifname
+            nlpackets.append(link)
+
+        for (ifname, state) in slaves:
+            if state == 'up':
+                if_change = Link.IFF_UP
+                if_flags = Link.IFF_UP
+            else:
+                if_change = 0
+                if_flags = 0
+
+            link = Link(RTM_NEWLINK, debug, use_color=self.use_color)
+            link.flags = NLM_F_REQUEST | NLM_F_ACK
+            link.body = pack('=BxxxiLL', socket.AF_UNSPEC, 0, if_flags, if_change)
+            link.add_attribute(Link.IFLA_IFNAME, ifname)
+            link.add_attribute(Link.IFLA_MASTER, master_ifindex)
+            link.build_message(self.sequence.next(), self.pid)
+            seq_to_ifname[link.seq] = ifname
+            nlpackets.append(link)
+
+        errors = {}
+
+        for (seq, error) in sorted(self.tx_nlpackets_get_acks(nlpackets).iteritems()):
+            ifname = seq_to_ifname[seq]
+
+            # keep the first error, the master error is a consequence of it
+            if ifname not in errors:
+                errors[ifname] = error
+
+        return errors
+
     # =========
     # Neighbors
     # =========
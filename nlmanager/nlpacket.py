@@ -65,6 +65,10 @@ RTM_NEWROUTE  = 0x18
 RTM_DELROUTE  = 0x19
 RTM_GETROUTE  = 0x1A
 
+RTM_NEWRULE   = 0x20
+RTM_DELRULE   = 0x21
+RTM_GETRULE   = 0x22
+
 RTM_NEWQDISC  = 0x24
 RTM_DELQDISC  = 0x25
 RTM_GETQDISC  = 0x26
@@ -158,6 +162,14 @@ def mac_int_to_str(mac_int):
     return "%s.%s.%s" % (all_caps[0:4], all_caps[4:8], all_caps[8:12])
 
 
+def mac_str_to_bytes(mac_str):
+    """
+    Return a MAC string (00:11:22:33:44:55 or 0011.2233.4455) as 6 raw bytes
+    """
+    mac_int = int(mac_str.replace('.', '').replace(':', ''), 16)
+    return pack('>HL', mac_int >> 32, mac_int & 0xFFFFFFFF)
+
+
 def data_to_color_text(line_number, color, data, extra=''):
     (c1, c2, c3, c4) = unpack('BBBB', data[0:4])
     in_ascii = []
@@ -850,7 +862,7 @@ class AttributeIFLA_LINKINFO(Attribute):
 
         kind = self.value[Link.IFLA_INFO_KIND]
 
-        if kind not in ('vlan', 'macvlan', 'vxlan'):
+        if kind not in ('vlan', 'macvlan', 'vxlan', 'bond'):
             raise Exception('Unsupported IFLA_INFO_KIND %s' % kind)
 
         # For now this assumes that all data will be packed in the native endian
@@ -963,6 +975,46 @@ class AttributeIFLA_LINKINFO(Attribute):
                         else:
                             self.log.debug('Add support for encoding IFLA_INFO_DATA vxlan sub-attribute type %d' % info_data_type)
 
+                    elif kind == 'bond':
+                        if info_data_type in (Link.IFLA_BOND_AD_ACTOR_SYSTEM, ):
+                            sub_attr_pack_layout.append('HH')
+                            sub_attr_payload.append(10)  # length
+                            sub_attr_payload.append(info_data_type)
+
+                            sub_attr_pack_layout.append('6s')
+                            sub_attr_payload.append(mac_str_to_bytes(info_data_value))
+                            sub_attr_pack_layout.extend('xx')
+
+                        elif info_data_type in (Link.IFLA_BOND_AD_ACTOR_SYS_PRIO,
+                                                Link.IFLA_BOND_AD_USER_PORT_KEY):
+                            sub_attr_pack_layout.append('HH')
+                            sub_attr_payload.append(6)
+                            sub_attr_payload.append(info_data_type)
+
+                            sub_attr_pack_layout.append('H')
+                            sub_attr_payload.append(int(info_data_value))
+                            sub_attr_pack_layout.extend('xx')
+
+                        elif info_data_type in Link.ifla_bond_one_byte_values:
+                            sub_attr_pack_layout.append('HH')
+                            sub_attr_payload.append(5)
+                            sub_attr_payload.append(info_data_type)
+
+                            sub_attr_pack_layout.append('B')
+                            sub_attr_payload.append(int(info_data_value))
+                            sub_attr_pack_layout.extend('xxx')
+
+                        elif info_data_type in Link.ifla_bond_four_byte_values:
+                            sub_attr_pack_layout.append('HH')
+                            sub_attr_payload.append(8)
+                            sub_attr_payload.append(info_data_type)
+
+                            sub_attr_pack_layout.append('L')
+                            sub_attr_payload.append(int(info_data_value))
+
+                        else:
+                            self.log.debug('Add support for encoding IFLA_INFO_DATA bond sub-attribute type %d' % info_data_type)
+
             else:
                 self.log.debug('Add support for encoding IFLA_LINKINFO sub-attribute type %d' % sub_attr_type)
                 continue
@@ -1100,6 +1152,20 @@ class AttributeIFLA_LINKINFO(Attribute):
                             bond_value = {}
 
                             self.value[Link.IFLA_INFO_DATA][info_data_type] = bond_value
+
+                        elif info_data_type in (Link.IFLA_BOND_AD_ACTOR_SYSTEM, ):
+                            self.value[Link.IFLA_INFO_DATA][info_data_type] = ':'.join('%02x' % ord(x) for x in sub_attr_data[4:10])
+
+                        elif info_data_type in (Link.IFLA_BOND_AD_ACTOR_SYS_PRIO,
+                                                Link.IFLA_BOND_AD_USER_PORT_KEY):
+                            self.value[Link.IFLA_INFO_DATA][info_data_type] = unpack('=H', sub_attr_data[4:6])[0]
+
+                        elif info_data_type in Link.ifla_bond_one_byte_values:
+                            self.value[Link.IFLA_INFO_DATA][info_data_type] = unpack('=B', sub_attr_data[4])[0]
+
+                        elif info_data_type in Link.ifla_bond_four_byte_values:
+                            self.value[Link.IFLA_INFO_DATA][info_data_type] = unpack('=L', sub_attr_data[4:8])[0]
+
                         elif EXTRA_DEBUG:
                             self.log.debug('Add support for decoding IFLA_INFO_KIND bond type %s (%d), length %d, padded to %d' %
                                            (parent_msg.get_ifla_bond_string(info_data_type), info_data_type, info_data_length, info_data_end))
@@ -1255,6 +1321,9 @@ class NetlinkPacket(object):
         RTM_NEWROUTE  : 'RTM_NEWROUTE',
         RTM_DELROUTE  : 'RTM_DELROUTE',
         RTM_GETROUTE  : 'RTM_GETROUTE',
+        RTM_NEWRULE   : 'RTM_NEWRULE',
+        RTM_DELRULE   : 'RTM_DELRULE',
+        RTM_GETRULE   : 'RTM_GETRULE',
         RTM_NEWQDISC  : 'RTM_NEWQDISC',
         RTM_DELQDISC  : 'RTM_DELQDISC',
         RTM_GETQDISC  : 'RTM_GETQDISC'
@@ -1332,7 +1401,7 @@ class NetlinkPacket(object):
             foo.append('NLM_F_ECHO')
 
         # Modifiers to GET query
-        if msg_type in (RTM_GETLINK, RTM_GETADDR, RTM_GETNEIGH, RTM_GETROUTE, RTM_GETQDISC):
+        if msg_type in (RTM_GETLINK, RTM_GETADDR, RTM_GETNEIGH, RTM_GETROUTE, RTM_GETRULE, RTM_GETQDISC):
             if flags & NLM_F_DUMP:
                 foo.append('NLM_F_DUMP')
             else:
@@ -1346,7 +1415,7 @@ class NetlinkPacket(object):
                 foo.append('NLM_F_ATOMIC')
 
         # Modifiers to NEW query
-        elif msg_type in (RTM_NEWLINK, RTM_NEWADDR, RTM_NEWNEIGH, RTM_NEWROUTE, RTM_NEWQDISC):
+        elif msg_type in (RTM_NEWLINK, RTM_NEWADDR, RTM_NEWNEIGH, RTM_NEWROUTE, RTM_NEWRULE, RTM_NEWQDISC):
             if flags & NLM_F_REPLACE:
                 foo.append('NLM_F_REPLACE')
 
@@ -2269,6 +2338,34 @@ class Link(NetlinkPacket):
         IFLA_BOND_CL_LACP_BYPASS_ALL_ACTIVE : 'IFLA_BOND_CL_LACP_BYPASS_ALL_ACTIVE'
     }
 
+    ifla_bond_one_byte_values = (IFLA_BOND_MODE,
+                                 IFLA_BOND_USE_CARRIER,
+                                 IFLA_BOND_PRIMARY_RESELECT,
+                                 IFLA_BOND_FAIL_OVER_MAC,
+                                 IFLA_BOND_XMIT_HASH_POLICY,
+                                 IFLA_BOND_NUM_PEER_NOTIF,
+                                 IFLA_BOND_ALL_SLAVES_ACTIVE,
+                                 IFLA_BOND_AD_LACP_RATE,
+                                 IFLA_BOND_AD_SELECT,
+                                 IFLA_BOND_CL_LACP_BYPASS_ALLOW,
+                                 IFLA_BOND_CL_LACP_BYPASS_ACTIVE,
+                                 IFLA_BOND_CL_CLAG_ENABLE,
+                                 IFLA_BOND_CL_LACP_BYPASS_ALL_ACTIVE)
+
+    ifla_bond_four_byte_values = (IFLA_BOND_ACTIVE_SLAVE,
+                                  IFLA_BOND_MIIMON,
+                                  IFLA_BOND_UPDELAY,
+                                  IFLA_BOND_DOWNDELAY,
+                                  IFLA_BOND_ARP_INTERVAL,
+                                  IFLA_BOND_ARP_VALIDATE,
+                                  IFLA_BOND_ARP_ALL_TARGETS,
+                                  IFLA_BOND_PRIMARY,
+                                  IFLA_BOND_RESEND_IGMP,
+                                  IFLA_BOND_MIN_LINKS,
+                                  IFLA_BOND_LP_INTERVAL,
+                                  IFLA_BOND_PACKETS_PER_SLAVE,
+                                  IFLA_BOND_CL_LACP_BYPASS_PERIOD)
+
     # =========================================
     # IFLA_INFO_DATA attributes for bridges
     # =========================================
@@ -2969,3 +3066,147 @@ class Route(NetlinkPacket):
                 end = start + 4
                 self.dump_buffer.append(data_to_color_text(self.line_number, color, self.msg_data[start:end], extra))
                 self.line_number += 1
+
+
+class Rule(NetlinkPacket):
+    """
+    Service Header
+
+    0                   1                   2                   3
+    0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    |   Family    |  Dest length  |   Src length  |     TOS       |
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    |  Table ID   |   Reserved    |   Reserved    |    Action     |
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    |                          Flags                              |
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    """
+
+    # Rule attributes
+    # /usr/include/linux/fib_rules.h
+    FRA_UNSPEC              = 0x00
+    FRA_DST                 = 0x01  # destination address
+    FRA_SRC                 = 0x02  # source address
+    FRA_IIFNAME             = 0x03  # interface name
+    FRA_GOTO                = 0x04  # target to jump to (FR_ACT_GOTO)
+    FRA_UNUSED2             = 0x05
+    FRA_PRIORITY            = 0x06  # priority/preference
+    FRA_UNUSED3             = 0x07
+    FRA_UNUSED4             = 0x08
+    FRA_UNUSED5             = 0x09
+    FRA_FWMARK              = 0x0A  # mark
+    FRA_FLOW                = 0x0B  # flow/class id
+    FRA_TUN_ID              = 0x0C
+    FRA_SUPPRESS_IFGROUP    = 0x0D
+    FRA_SUPPRESS_PREFIXLEN  = 0x0E
+    FRA_TABLE               = 0x0F  # Extended table id
+    FRA_FWMASK              = 0x10  # mask for netfilter mark
+    FRA_OIFNAME             = 0x11
+    FRA_PAD                 = 0x12
+    FRA_L3MDEV              = 0x13  # iif or oif is l3mdev goto its table
+
+    attribute_to_class = {
+        FRA_UNSPEC              : ('FRA_UNSPEC', AttributeGeneric),
+        FRA_DST                 : ('FRA_DST', AttributeIPAddress),
+        FRA_SRC                 : ('FRA_SRC', AttributeIPAddress),
+        FRA_IIFNAME             : ('FRA_IIFNAME', AttributeStringInterfaceName),
+        FRA_GOTO                : ('FRA_GOTO', AttributeFourByteValue),
+        FRA_UNUSED2             : ('FRA_UNUSED2', AttributeGeneric),
+        FRA_PRIORITY            : ('FRA_PRIORITY', AttributeFourByteValue),
+        FRA_UNUSED3             : ('FRA_UNUSED3', AttributeGeneric),
+        FRA_UNUSED4             : ('FRA_UNUSED4', AttributeGeneric),
+        FRA_UNUSED5             : ('FRA_UNUSED5', AttributeGeneric),
+        FRA_FWMARK              : ('FRA_FWMARK', AttributeFourByteValue),
+        FRA_FLOW                : ('FRA_FLOW', AttributeFourByteValue),
+        FRA_TUN_ID              : ('FRA_TUN_ID', AttributeGeneric),
+        FRA_SUPPRESS_IFGROUP    : ('FRA_SUPPRESS_IFGROUP', AttributeFourByteValue),
+        FRA_SUPPRESS_PREFIXLEN  : ('FRA_SUPPRESS_PREFIXLEN', AttributeFourByteValue),
+        FRA_TABLE               : ('FRA_TABLE', AttributeFourByteValue),
+        FRA_FWMASK              : ('FRA_FWMASK', AttributeFourByteValue),
+        FRA_OIFNAME             : ('FRA_OIFNAME', AttributeStringInterfaceName),
+        FRA_PAD                 : ('FRA_PAD', AttributeGeneric),
+        FRA_L3MDEV              : ('FRA_L3MDEV', AttributeOneByteValue)
+    }
+
+    # Rule actions
+    # /usr/include/linux/fib_rules.h
+    FR_ACT_UNSPEC      = 0x00
+    FR_ACT_TO_TBL      = 0x01  # Pass to fixed table
+    FR_ACT_GOTO        = 0x02  # Jump to another rule
+    FR_ACT_NOP         = 0x03  # No operation
+    FR_ACT_RES3        = 0x04
+    FR_ACT_RES4        = 0x05
+    FR_ACT_BLACKHOLE   = 0x06  # Drop without notification
+    FR_ACT_UNREACHABLE = 0x07  # Drop with ENETUNREACH
+    FR_ACT_PROHIBIT    = 0x08  # Drop with EACCES
+
+    action_to_string = {
+        FR_ACT_UNSPEC      : 'FR_ACT_UNSPEC',
+        FR_ACT_TO_TBL      : 'FR_ACT_TO_TBL',
+        FR_ACT_GOTO        : 'FR_ACT_GOTO',
+        FR_ACT_NOP         : 'FR_ACT_NOP',
+        FR_ACT_RES3        : 'FR_ACT_RES3',
+        FR_ACT_RES4        : 'FR_ACT_RES4',
+        FR_ACT_BLACKHOLE   : 'FR_ACT_BLACKHOLE',
+        FR_ACT_UNREACHABLE : 'FR_ACT_UNREACHABLE',
+        FR_ACT_PROHIBIT    : 'FR_ACT_PROHIBIT'
+    }
+
+    def __init__(self, msgtype, debug=False, logger=None, use_color=True):
+        NetlinkPacket.__init__(self, msgtype, debug, logger, use_color)
+        self.PACK = '=8BI'
+        self.LEN = calcsize(self.PACK)
+
+    def get_action_string(self, index=None):
+        if index is None:
+            index = self.action
+        return self.get_string(self.action_to_string, index)
+
+    def get_table(self):
+        """
+        The table ID in the service header is only 8 bits, FRA_TABLE
+        carries the full table ID
+        """
+        table = self.get_attribute_value(self.FRA_TABLE)
+
+        if table is None:
+            return self.table_id
+        return table
+
+    def decode_service_header(self):
+
+        # Nothing to do if the message did not contain a service header
+        if self.length == self.header_LEN:
+            return
+
+        (self.family, self.dst_len, self.src_len, self.tos,
+         self.table_id, _, _, self.action, self.rule_flags) = \
+            unpack(self.PACK, self.msg_data[:self.LEN])
+
+        if self.debug:
+            color = yellow if self.use_color else None
+            color_start = "\033[%dm" % color if color else ""
+            color_end = "\033[0m" if color else ""
+            self.dump_buffer.append("  %sService Header%s" % (color_start, color_end))
+
+            for x in range(0, self.LEN/4):
+                if self.line_number == 5:
+                    extra = "Family %s (%d), Destination Length %s (%d), Source Length %s (%d), TOS %s (%d)" % \
+                            (zfilled_hex(self.family, 2), self.family,
+                             zfilled_hex(self.dst_len, 2), self.dst_len,
+                             zfilled_hex(self.src_len, 2), self.src_len,
+                             zfilled_hex(self.tos, 2), self.tos)
+                elif self.line_number == 6:
+                    extra = "Table ID %s (%d), Action %s (%d - %s)" % \
+                            (zfilled_hex(self.table_id, 2), self.table_id,
+                             zfilled_hex(self.action, 2), self.action, self.get_action_string())
+                elif self.line_number == 7:
+                    extra = "Flags %s" % zfilled_hex(self.rule_flags, 8)
+                else:
+                    extra = "Unexpected line number %d" % self.line_number
+
+                start = x * 4
+                end = start + 4
+                self.dump_buffer.append(data_to_color_text(self.line_number, color, self.msg_data[start:end], extra))
+                self.line_number += 1
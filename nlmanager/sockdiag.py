@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+from ipaddr import IPv4Address, IPv6Address
+from nlpacket import *
+from nlmanager import NetlinkManager, NetlinkError
+from select import select
+from struct import pack, unpack, calcsize
+import logging
+import os
+import socket
+
+log = logging.getLogger(__name__)
+
+NETLINK_SOCK_DIAG = 4
+
+# sock_diag message types
+# /usr/include/linux/sock_diag.h
+SOCK_DIAG_BY_FAMILY = 20
+SOCK_DESTROY        = 21
+
+# TCP states
+# /usr/include/netinet/tcp.h
+TCP_ESTABLISHED = 1
+TCP_SYN_SENT    = 2
+TCP_SYN_RECV    = 3
+TCP_FIN_WAIT1   = 4
+TCP_FIN_WAIT2   = 5
+TCP_TIME_WAIT   = 6
+TCP_CLOSE       = 7
+TCP_CLOSE_WAIT  = 8
+TCP_LAST_ACK    = 9
+TCP_LISTEN      = 10
+TCP_CLOSING     = 11
+
+TCPF_ALL  = (1 << 12) - 1
+
+# What ss shows by default, every socket that has a peer
+TCPF_CONN = TCPF_ALL & ~((1 << TCP_LISTEN) | (1 << TCP_CLOSE) |
+                         (1 << TCP_TIME_WAIT) | (1 << TCP_SYN_RECV))
+
+
+class InetDiagSocket(object):
+    """
+    A socket from a SOCK_DIAG_BY_FAMILY dump, struct inet_diag_msg
+
+    0                   1                   2                   3
+    0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    |   Family    |    State      |    Timer      |   Retrans     |
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    |  struct inet_diag_sockid (source/dest port and address,     |
+    |  bound interface index, cookie) - 48 bytes                  |
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    |  Expires | RQueue | WQueue | UID | Inode                    |
+    +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    """
+
+    PACK = '=BBBB48sIIIII'
+    LEN = calcsize(PACK)
+
+    SOCKID_PACK = '>HH16s16s'
+    SOCKID_LEN = calcsize(SOCKID_PACK)
+
+    def __init__(self, protocol, data):
+        (self.family, self.state, self.timer, self.retrans, self.sockid,
+         self.expires, self.rqueue, self.wqueue, self.uid, self.inode) = \
+            unpack(self.PACK, data[:self.LEN])
+        self.protocol = protocol
+
+        (self.sport, self.dport, src, dst) = \
+            unpack(self.SOCKID_PACK, self.sockid[:self.SOCKID_LEN])
+        self.ifindex = unpack('=I', self.sockid[self.SOCKID_LEN:self.SOCKID_LEN + 4])[0]
+
+        if self.family == socket.AF_INET:
+            self.src = IPv4Address(unpack('>L', src[:4])[0])
+            self.dst = IPv4Address(unpack('>L', dst[:4])[0])
+        else:
+            (data1, data2) = unpack('>QQ', src)
+            self.src = IPv6Address(data1 << 64 | data2)
+            (data1, data2) = unpack('>QQ', dst)
+            self.dst = IPv6Address(data1 << 64 | data2)
+
+    def __str__(self):
+        return '%s:%d -> %s:%d ifindex %d inode %d' % (self.src, self.sport,
+                                                       self.dst, self.dport,
+                                                       self.ifindex, self.inode)
+
+
+class SockDiagManager(NetlinkManager):
+    """
+    NETLINK_SOCK_DIAG client: dump inet sockets and close them with
+    SOCK_DESTROY (the kernel must be built with CONFIG_INET_DIAG_DESTROY)
+    """
+
+    def __str__(self):
+        return 'SockDiagManager'
+
+    def tx_socket_allocate(self):
+        self.tx_socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG)
+        self.tx_socket.bind((self.pid, 0))
+
+    def _inet_diag_req(self, msgtype, flags, family, protocol, states, sockid=None):
+        """
+        struct inet_diag_req_v2: family, protocol, ext, pad, states and
+        the struct inet_diag_sockid to match, all zeroes for a dump
+        """
+        msg = NetlinkPacket(msgtype, False, use_color=self.use_color)
+        msg.flags = flags
+        msg.body = pack('=BBBxI', family, protocol, 0, states)
+        msg.body += sockid if sockid else '\0' * 48
+        msg.build_message(self.sequence.next(), self.pid)
+        return msg
+
+    def sockets_dump(self, family, protocol, states=TCPF_ALL):
+        """
+        Return the list of InetDiagSocket of the given family
+        (AF_INET/AF_INET6) and protocol (IPPROTO_TCP/IPPROTO_UDP)
+        in any of the states bitmask
+        """
+        header_PACK = NetlinkPacket.header_PACK
+        header_LEN = NetlinkPacket.header_LEN
+        null_read = 0
+        MAX_NULL_READS = 3
+        sockets = []
+
+        msg = self._inet_diag_req(SOCK_DIAG_BY_FAMILY, NLM_F_REQUEST | NLM_F_DUMP,
+                                  family, protocol, states)
+        self.tx_nlpacket(msg)
+
+        while True:
+
+            if self.shutdown_flag:
+                log.info('shutdown flag is True, exiting')
+                return sockets
+
+            (readable, writeable, exceptional) = select([self.tx_socket, ], [], [self.tx_socket, ], 1)
+
+            if not readable:
+                null_read += 1
+
+                if null_read >= MAX_NULL_READS:
+                    log.info('Socket was not readable for %d attempts' % null_read)
+                    return sockets
+                continue
+
+            null_read = 0
+            data = self.tx_socket.recv(65536)
+
+            if not data:
+                log.info('RXed zero length data, the socket is closed')
+                return sockets
+
+            while data:
+                (length, msgtype, flags, seq, pid) = unpack(header_PACK, data[:header_LEN])
+
+                if pid != msg.pid or seq != msg.seq:
+                    data = data[length:]
+                    continue
+
+                if msgtype == NLMSG_DONE:
+                    return sockets
+
+                elif msgtype == NLMSG_ERROR:
+                    error_code = abs(unpack('=i', data[header_LEN:header_LEN+4])[0])
+
+                    if error_code:
+                        raise NetlinkError('Operation failed with \'%s\'' % os.strerror(error_code))
+                    return sockets
+
+                elif msgtype == SOCK_DIAG_BY_FAMILY:
+                    sockets.append(InetDiagSocket(protocol, data[header_LEN:length]))
+
+                data = data[length:]
+
+    def sockets_destroy(self, sockets):
+        """
+        Close all the InetDiagSocket of sockets with one SOCK_DESTROY
+        each, concatenated. Return a dictionary of InetDiagSocket ->
+        NetlinkError for the sockets that could not be closed
+        """
+        nlpackets = []
+        seq_to_socket = {}
+
+        for sock in sockets:
+            msg = self._inet_diag_req(SOCK_DESTROY, NLM_F_REQUEST | NLM_F_ACK,
+                                      sock.family, sock.protocol, TCPF_ALL,
+                                      sock.sockid)
+            nlpackets.append(msg)
+            seq_to_socket[msg.seq] = sock
+
+        errors = self.tx_nlpackets_get_acks(nlpackets)
+        return dict([(seq_to_socket[seq], error) for (seq, error) in errors.iteritems()])
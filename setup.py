@@ -23,6 +23,7 @@ setup(name='ifupdown2',
                     ['nlmanager/nllistener.py',
                      'nlmanager/nlmanager.py',
                      'nlmanager/nlpacket.py',
+                     'nlmanager/sockdiag.py',
                      'nlmanager/__init__.py',
                      'nlmanager/README']),
                    ('/etc/network/ifupdown2/', ['config/addons.conf']),